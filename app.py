@@ -11,34 +11,62 @@ def create_app():
     # Initialize extensions with app
     db.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, render_as_batch=True)
+
+    # Per-connection engine settings (SQLite pragmas)
+    from services import database, replicas
+    database.init_app(app)
+    replicas.init_app(app)
     
     login_manager.login_view = 'auth.login'
 
-    with app.app_context():
-        # Import models to ensure they are registered
-        from models import User, Post, Comment, SMSLog
-        
-        # Create database tables (for MVP simplicity)
-        db.create_all()
+    # Import models to ensure they are registered
+    from models import User, Post, Comment, SMSLog
+
+    if app.config['AUTO_CREATE_TABLES']:
+        # Create database tables (for MVP simplicity); production runs migrations instead
+        with app.app_context():
+            db.create_all()
 
     # Register Blueprints
     from routes.auth import auth_bp
     from routes.feed import feed_bp
     from routes.user import user_bp
     from routes.admin import admin_bp
+    from routes.uploads import uploads_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(feed_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(uploads_bp)
+
+    # Resolve stored image paths to URLs in templates
+    from services.storage import media_url
+    from services.images import image_srcset
+    app.add_template_filter(media_url)
+    app.add_template_filter(image_srcset)
+
+    # Cached feed card fragments
+    from services import fragments
+    fragments.init_app(app)
+
+    # Hashed static URLs, immutable caching and response compression
+    from services import http_cache, compression
+    http_cache.init_app(app)
+    compression.init_app(app)
+
+    # CLI maintenance commands
+    from commands import register_commands
+    register_commands(app)
     
     # Alias for profile -> settings to match base.html link
     app.add_url_rule('/profile', endpoint='profile', view_func=lambda: redirect(url_for('user.settings')))
 
     @login_manager.user_loader
     def load_user(user_id):
-        from models import User
-        return User.query.get(int(user_id))
+        # Served from a short-lived identity cache, see services/users.py
+        from services.users import load_user as load_cached_user
+        return load_cached_user(user_id)
 
     @app.route('/')
     def index():
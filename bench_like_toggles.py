@@ -0,0 +1,117 @@
+"""
+Like-toggle benchmark: per-click transactions vs the write-behind buffer.
+
+Client threads hammer POST /post/<id>/like (most clicks on one viral post)
+through the app, each thread clicking as its own set of users. The run is
+done twice, in fresh processes: with the default path (a write transaction
+per click) and with LIKE_WRITE_BEHIND=1. It reports toggles/s, how many
+database transactions those cost, p95 latency and failed requests, then
+checks that every Post.like_count matches its Like rows once the buffer has
+been flushed.
+
+    python bench_like_toggles.py
+    BENCH_CLIENTS=16 BENCH_SECONDS=10 python bench_like_toggles.py
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+CLIENTS = int(os.environ.get('BENCH_CLIENTS', 8))
+SECONDS = float(os.environ.get('BENCH_SECONDS', 5))
+USERS = 200
+POSTS = 50
+VIRAL_SHARE = 0.7  # Share of clicks going to post 1
+
+MODES = {
+    'per-click commit': {'LIKE_WRITE_BEHIND': '0'},
+    'write-behind': {'LIKE_WRITE_BEHIND': '1'},
+}
+
+
+def child():
+    from sqlalchemy import event, func
+    from app import create_app
+    from extensions import db
+    from models import User, Post, Like
+    from services.toggles import get_toggle_buffer
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all(User(username=f'u{i}', email=f'u{i}@test.com', role='paid') for i in range(USERS))
+        db.session.flush()
+        db.session.add_all(Post(content=f'post {i}', author_id=i % USERS + 1) for i in range(POSTS))
+        db.session.commit()
+        commits = []
+        event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+
+    counts = {'toggles': 0, 'failed': 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + SECONDS
+
+    def clicker(user_ids):
+        clients = []
+        for user_id in user_ids:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+            clients.append(client)
+        while time.monotonic() < deadline:
+            post_id = 1 if random.random() < VIRAL_SHARE else random.randint(2, POSTS)
+            started = time.perf_counter()
+            response = random.choice(clients).post(f'/post/{post_id}/like',
+                                                   headers={'X-Requested-With': 'XMLHttpRequest'})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                counts['toggles' if response.status_code == 200 else 'failed'] += 1
+
+    threads = [threading.Thread(target=clicker, args=(range(i + 1, USERS + 1, CLIENTS),))
+               for i in range(CLIENTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        transactions = len(commits)
+        buffer = get_toggle_buffer()
+        if buffer:
+            buffer.flush()
+        actual = dict(db.session.query(Like.post_id, func.count(Like.id)).group_by(Like.post_id).all())
+        mismatched = sum(1 for post_id, like_count in db.session.query(Post.id, Post.like_count)
+                         if like_count != actual.get(post_id, 0))
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    print(json.dumps(dict(counts, transactions=transactions, p95_ms=p95 * 1000, mismatched=mismatched)))
+
+
+def main():
+    print(f"--- {CLIENTS} clients toggling likes for {SECONDS:.0f}s, "
+          f"{VIRAL_SHARE:.0%} on one post ---")
+    for name, overrides in MODES.items():
+        env = dict(os.environ, **overrides, BENCH_CHILD='1', PASSWORD_HASH_WORKERS='0',
+                   DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+        output = subprocess.run([sys.executable, __file__], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<17} {result['toggles'] / SECONDS:8.0f} toggles/s "
+              f"{result['transactions'] / SECONDS:8.1f} transactions/s "
+              f"p95 {result['p95_ms']:6.1f} ms | {result['failed']} failed, "
+              f"{result['mismatched']} posts with a wrong like_count")
+
+
+if __name__ == '__main__':
+    if os.environ.get('BENCH_CHILD'):
+        child()
+    else:
+        main()
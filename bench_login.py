@@ -0,0 +1,111 @@
+"""
+Login throughput benchmark.
+
+Concurrent clients log in while a second group keeps requesting a cheap page.
+The run is done twice, first with hashing inline on the request thread
+(PASSWORD_HASH_WORKERS=0) and then with the process pool. It reports logins/s,
+login latency, how long the cheap requests took meanwhile, how many logins
+were refused as busy and how many stored hashes were upgraded to
+PASSWORD_HASH_METHOD.
+
+    python bench_login.py
+    PASSWORD_HASH_METHOD=scrypt BENCH_THREADS=32 BENCH_POOL_WORKERS=4 python bench_login.py
+"""
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from werkzeug.security import generate_password_hash
+from app import create_app
+from extensions import db
+from models import User
+from services.passwords import needs_rehash
+
+THREADS = int(os.environ.get('BENCH_THREADS', 8))
+LOGINS = int(os.environ.get('BENCH_LOGINS', 3))  # Per thread
+PROBES = int(os.environ.get('BENCH_PROBE_THREADS', 2))
+POOL_WORKERS = int(os.environ.get('BENCH_POOL_WORKERS', 2))
+OLD_METHOD = 'pbkdf2:sha256:260000'  # Seeded hashes, upgraded on first login
+PASSWORD = 'correct horse battery staple'
+
+app = create_app()
+
+
+def reset():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        old_hash = generate_password_hash(PASSWORD, method=OLD_METHOD)
+        db.session.add_all([User(username=f'bench{i}', email=f'bench{i}@test.com', password_hash=old_hash)
+                            for i in range(THREADS)])
+        db.session.commit()
+
+
+def percentile(values, p):
+    return sorted(values)[int(len(values) * p / 100)] if values else 0.0
+
+
+def run(name, workers):
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    reset()
+    latencies, probes, outcomes = [], [], {'ok': 0, 'busy': 0, 'failed': 0}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login_worker(i):
+        client = app.test_client()
+        for _ in range(LOGINS):
+            start = time.perf_counter()
+            response = client.post('/login', data={'email': f'bench{i}@test.com', 'password': PASSWORD})
+            elapsed = time.perf_counter() - start
+            location = response.headers.get('Location', '')
+            outcome = 'ok' if location.endswith('/feed') else 'busy' if response.status_code == 302 else 'failed'
+            client.get('/logout')
+            with lock:
+                latencies.append(elapsed)
+                outcomes[outcome] += 1
+
+    def probe_worker():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/login')
+            with lock:
+                probes.append(time.perf_counter() - start)
+
+    probe_threads = [threading.Thread(target=probe_worker) for _ in range(PROBES)]
+    login_threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(THREADS)]
+    for t in probe_threads:
+        t.start()
+    start = time.perf_counter()
+    for t in login_threads:
+        t.start()
+    for t in login_threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in probe_threads:
+        t.join()
+
+    with app.app_context():
+        upgraded = sum(not needs_rehash(h) for (h,) in db.session.query(User.password_hash))
+    print(f"{name:<10} {outcomes['ok'] / elapsed:6.1f} logins/s | login p50 {statistics.median(latencies) * 1000:6.0f} ms "
+          f"p95 {percentile(latencies, 95) * 1000:6.0f} ms | cheap page p95 {percentile(probes, 95) * 1000:6.1f} ms "
+          f"| ok {outcomes['ok']} busy {outcomes['busy']} failed {outcomes['failed']} | upgraded {upgraded}/{THREADS}")
+    return outcomes['failed'] == 0 and upgraded == THREADS
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        from services.passwords import hash_method
+        method = hash_method()
+    print(f"--- {THREADS} clients x {LOGINS} logins, {PROBES} cheap-page clients, "
+          f"{OLD_METHOD} -> {method}, {os.cpu_count()} CPUs ---")
+    ok = run('inline', 0)
+    ok = run(f'pool x{POOL_WORKERS}', POOL_WORKERS) and ok
+    assert ok, "logins failed or hashes were not upgraded"
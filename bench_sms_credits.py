@@ -0,0 +1,100 @@
+"""
+Concurrency benchmark for SMS credit debits.
+
+Many threads debit one admin's balance in parallel, first with the old
+read-modify-write (`user.sms_credits -= cost`), then with the ledger's
+conditional UPDATE. It reports throughput, errors and whether the final
+balance and ledger stay consistent.
+
+    python bench_sms_credits.py                      # temporary SQLite file
+    DATABASE_URL=postgresql://... python bench_sms_credits.py
+"""
+import os
+import tempfile
+import threading
+import time
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import create_app
+from extensions import db
+from models import User, CreditLedger
+from services.credits import InsufficientCredits, debit, credit, current_balance, ledger_balance
+
+THREADS = int(os.environ.get('BENCH_THREADS', 16))
+ATTEMPTS = int(os.environ.get('BENCH_ATTEMPTS', 50))  # Per thread
+START_BALANCE = THREADS * ATTEMPTS // 2  # Half of the attempts must be refused
+
+app = create_app()
+
+
+def reset():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = User(username='bench', email='bench@test.com', role='owner', sms_credits=0)
+        db.session.add(admin)
+        db.session.flush()
+        credit(admin.id, START_BALANCE, 'opening_balance')
+        db.session.commit()
+        return admin.id
+
+
+def naive_debit(user_id):
+    user = db.session.get(User, user_id)
+    if user.sms_credits < 1:
+        raise InsufficientCredits()
+    user.sms_credits -= 1
+    db.session.add(CreditLedger(user_id=user_id, delta=-1, reason='sms_broadcast'))
+
+
+def ledger_debit(user_id):
+    debit(user_id, 1, 'sms_broadcast')
+
+
+def run(name, operation):
+    user_id = reset()
+    counts = {'ok': 0, 'refused': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            for _ in range(ATTEMPTS):
+                try:
+                    operation(user_id)
+                    db.session.commit()
+                    outcome = 'ok'
+                except InsufficientCredits:
+                    db.session.rollback()
+                    outcome = 'refused'
+                except Exception:
+                    db.session.rollback()
+                    outcome = 'errors'
+                with lock:
+                    counts[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        balance = current_balance(user_id)
+        ledger = ledger_balance(user_id)
+    expected = START_BALANCE - counts['ok']
+    consistent = balance == expected == ledger and balance >= 0
+    print(f"{name:<18} {THREADS * ATTEMPTS / elapsed:8.0f} ops/s | ok {counts['ok']:4d} "
+          f"refused {counts['refused']:4d} errors {counts['errors']:4d} | balance {balance} "
+          f"(expected {expected}, ledger {ledger}) {'CONSISTENT' if consistent else 'INCONSISTENT'}")
+    return consistent
+
+
+if __name__ == '__main__':
+    print(f"--- {THREADS} threads x {ATTEMPTS} debits, start balance {START_BALANCE} "
+          f"on {app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]} ---")
+    run('read-modify-write', naive_debit)
+    assert run('conditional UPDATE', ledger_debit), "ledger debits drifted"
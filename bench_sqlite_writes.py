@@ -0,0 +1,112 @@
+"""
+Concurrent write benchmark for the SQLite engine settings.
+
+Writer threads toggle likes (Like row plus counter UPDATE, one transaction
+each) while reader threads load feed pages. The run is done twice, in fresh
+processes: with SQLite's defaults (rollback journal, synchronous=FULL,
+Python's 5s busy handler) and with the configured pragmas (WAL,
+synchronous=NORMAL, busy_timeout). It reports writes/s, reads/s and how
+many operations failed with "database is locked".
+
+    python bench_sqlite_writes.py
+    BENCH_WRITERS=16 BENCH_SECONDS=10 python bench_sqlite_writes.py
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+WRITERS = int(os.environ.get('BENCH_WRITERS', 8))
+READERS = int(os.environ.get('BENCH_READERS', 4))
+SECONDS = float(os.environ.get('BENCH_SECONDS', 5))
+USERS = 200
+POSTS = 500
+
+MODES = {
+    'rollback journal': {'SQLITE_JOURNAL_MODE': '', 'SQLITE_SYNCHRONOUS': '', 'SQLITE_BUSY_TIMEOUT_MS': ''},
+    'WAL + pragmas': {},  # Config defaults
+}
+
+
+def child():
+    from sqlalchemy.exc import IntegrityError, OperationalError
+    from app import create_app
+    from extensions import db
+    from models import User, Post, Like
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all(User(username=f'u{i}', email=f'u{i}@test.com') for i in range(USERS))
+        db.session.flush()
+        db.session.add_all(Post(content=f'post {i}', author_id=i % USERS + 1) for i in range(POSTS))
+        db.session.commit()
+        journal = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+    counts = {'writes': 0, 'reads': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + SECONDS
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def writer():
+        with app.app_context():
+            while time.monotonic() < deadline:
+                user_id, post_id = random.randint(1, USERS), random.randint(1, POSTS)
+                try:
+                    deleted = Like.query.filter_by(user_id=user_id, post_id=post_id).delete()
+                    if not deleted:
+                        db.session.add(Like(user_id=user_id, post_id=post_id))
+                    Post.adjust_counters(post_id, like_count=-1 if deleted else 1)
+                    db.session.commit()
+                    count('writes')
+                except OperationalError:
+                    db.session.rollback()
+                    count('locked')
+                except IntegrityError:
+                    db.session.rollback()
+
+    def reader():
+        with app.app_context():
+            while time.monotonic() < deadline:
+                try:
+                    Post.query.order_by(Post.created_at.desc(), Post.id.desc()).limit(20).all()
+                    db.session.commit()
+                    count('reads')
+                except OperationalError:
+                    db.session.rollback()
+                    count('locked')
+
+    threads = ([threading.Thread(target=writer) for _ in range(WRITERS)]
+               + [threading.Thread(target=reader) for _ in range(READERS)])
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(json.dumps(dict(counts, journal=journal)))
+
+
+def main():
+    print(f"--- {WRITERS} like-toggle writers + {READERS} feed readers for {SECONDS:.0f}s ---")
+    for name, overrides in MODES.items():
+        env = dict(os.environ, **overrides, BENCH_CHILD='1',
+                   DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+        output = subprocess.run([sys.executable, __file__], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<17} ({result['journal']:>6}) {result['writes'] / SECONDS:8.0f} writes/s "
+              f"{result['reads'] / SECONDS:8.0f} reads/s | {result['locked']} 'database is locked' errors")
+
+
+if __name__ == '__main__':
+    if os.environ.get('BENCH_CHILD'):
+        child()
+    else:
+        main()
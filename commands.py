@@ -0,0 +1,179 @@
+"""
+Maintenance commands, available through the flask CLI:
+
+    flask --app app:create_app reconcile-counters
+    flask --app app:create_app gc-blobs
+    flask --app app:create_app reconcile-credits
+    flask --app app:create_app rebuild-search-index
+    flask --app app:create_app resume-sms-broadcasts
+"""
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, select, update
+from extensions import db
+
+
+@click.command('reconcile-counters')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Posts recomputed per transaction.')
+@with_appcontext
+def reconcile_counters(batch_size):
+    """Recompute Post.like_count/comment_count from the Like and Comment tables."""
+    from models import Post, Comment, Like
+
+    like_total = (select(func.count(Like.id))
+                  .where(Like.post_id == Post.id)
+                  .scalar_subquery())
+    comment_total = (select(func.count(Comment.id))
+                     .where(Comment.post_id == Post.id)
+                     .scalar_subquery())
+
+    # Walk the id range in batches so no single UPDATE holds the write lock for long
+    max_id = db.session.query(func.max(Post.id)).scalar() or 0
+    updated = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = db.session.execute(
+            update(Post)
+            .where(Post.id >= start, Post.id < start + batch_size)
+            .values(like_count=like_total, comment_count=comment_total)
+        )
+        db.session.commit()
+        updated += result.rowcount
+
+    click.echo(f'Reconciled counters for {updated} posts.')
+
+
+def _referenced_keys():
+    """Storage keys named by any Post/User image column, with how often."""
+    from collections import Counter
+    from models import Post, User
+    from services.blobstore import key_for_path
+
+    referenced = Counter()
+    for column in (Post.image_path, Post.image_thumb_path, Post.image_feed_path,
+                   User.avatar_path, User.avatar_thumb_path):
+        # Compared by key, so a changed storage URL scheme still matches
+        referenced.update(key_for_path(path) for path, in
+                          db.session.query(column).filter(column.isnot(None)).yield_per(1000))
+    return referenced
+
+
+@click.command('gc-blobs')
+@click.option('--recount', is_flag=True,
+              help='Recompute reference counts from Post/User image paths first.')
+@click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+@with_appcontext
+def gc_blobs(recount, dry_run):
+    """Delete uploaded blobs (and their variants) unreferenced for BLOB_GC_GRACE seconds,
+    and direct uploads that were never confirmed."""
+    from models import Blob, PendingUpload
+    from services.blobstore import variant_keys
+    from services.storage import get_storage_provider
+
+    storage = get_storage_provider()
+    now = datetime.utcnow()
+    # One pass over the image columns instead of a scan per blob
+    referenced = _referenced_keys()
+
+    if recount:
+        for blob in Blob.query.yield_per(500):
+            blob.ref_count = referenced[blob.key]
+            if blob.ref_count <= 0 and blob.released_at is None:
+                blob.released_at = now
+        db.session.commit()
+
+    removed = 0
+    freed = 0
+    cutoff = now - timedelta(seconds=current_app.config['BLOB_GC_GRACE'])
+    for blob in Blob.query.filter(Blob.ref_count <= 0, Blob.released_at < cutoff).all():
+        # Re-check against the rows themselves before deleting anything
+        if referenced[blob.key]:
+            continue
+        if dry_run:
+            removed += 1
+            freed += blob.size
+            click.echo(f'Would remove {blob.key}')
+            continue
+        # Conditional, so a reference taken since the query keeps the blob
+        gone = db.session.execute(
+            delete(Blob).where(Blob.id == blob.id, Blob.ref_count <= 0)).rowcount
+        db.session.commit()
+        if not gone:
+            continue
+        removed += 1
+        freed += blob.size
+        for key in [blob.key, *variant_keys(blob.key)]:
+            if not referenced[key]:
+                storage.delete(key)
+
+    # Direct uploads whose confirm token has expired can no longer be attached
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['UPLOAD_CONFIRM_MAX_AGE'])
+    abandoned = 0
+    for pending in PendingUpload.query.filter(PendingUpload.created_at < cutoff).all():
+        abandoned += 1
+        if dry_run:
+            click.echo(f'Would remove unconfirmed upload {pending.key}')
+            continue
+        storage.delete(pending.key)
+        db.session.delete(pending)
+        db.session.commit()
+
+    verb = 'Would remove' if dry_run else 'Removed'
+    click.echo(f'{verb} {removed} blobs ({freed / 1024 / 1024:.1f} MB) '
+               f'and {abandoned} unconfirmed uploads.')
+
+
+@click.command('reconcile-credits')
+@click.option('--fix', is_flag=True, help='Rewrite drifted balances from the ledger.')
+@with_appcontext
+def reconcile_credits(fix):
+    """Compare User.sms_credits with the sum of each user's CreditLedger entries."""
+    from models import User, CreditLedger
+
+    ledger_total = (select(func.coalesce(func.sum(CreditLedger.delta), 0))
+                    .where(CreditLedger.user_id == User.id)
+                    .scalar_subquery())
+    drifted = (db.session.query(User.id, User.sms_credits, ledger_total)
+               .filter(func.coalesce(User.sms_credits, 0) != ledger_total)
+               .all())
+    for user_id, balance, expected in drifted:
+        click.echo(f'User {user_id}: balance {balance}, ledger {expected}')
+        if fix:
+            db.session.execute(update(User).where(User.id == user_id).values(sms_credits=expected))
+    db.session.commit()
+    click.echo(f'{len(drifted)} balances drifted' + (' (fixed).' if fix and drifted else '.'))
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index():
+    """Repopulate the post/comment full-text index from the tables."""
+    from services.search import get_search_backend
+
+    get_search_backend().rebuild()
+    db.session.commit()
+    click.echo('Search index rebuilt.')
+
+
+@click.command('resume-sms-broadcasts')
+@with_appcontext
+def resume_sms_broadcasts():
+    """Send queued SMS broadcasts and take over ones whose sender died.
+
+    Safe to run from cron or after every deploy: each job is claimed
+    atomically, so a job still being sent elsewhere is left alone.
+    """
+    from services.sms import resume_broadcasts
+
+    resumed = resume_broadcasts()
+    click.echo(f'Resumed {len(resumed)} broadcasts' + (f': {resumed}.' if resumed else '.'))
+
+
+def register_commands(app):
+    app.cli.add_command(reconcile_counters)
+    app.cli.add_command(gc_blobs)
+    app.cli.add_command(reconcile_credits)
+    app.cli.add_command(rebuild_search_index)
+    app.cli.add_command(resume_sms_broadcasts)
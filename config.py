@@ -9,12 +9,132 @@ class Config:
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace("postgres://", "postgresql://", 1)
         
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool (Postgres; SQLite keeps SQLAlchemy's defaults)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))  # Per process; cover gunicorn threads
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Seconds, below server/proxy idle limits
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))  # 0 = no limit
+
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE,
+    }
+    if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            connect_args={'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'},
+        )
+
+    # Read replicas: comma-separated URLs, used by @replica_reads views (services/replicas.py)
+    SQLALCHEMY_BINDS = {
+        f'replica{i}': url.strip()
+        for i, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))
+    }
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))  # Own writes read from primary
+
+    # SQLite connection pragmas (services/database.py); empty = SQLite's default
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'wal')  # Readers don't block the writer
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'normal')  # Safe with WAL, fewer fsyncs
+    SQLITE_BUSY_TIMEOUT_MS = os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')  # Wait for the write lock
+    # Dev convenience: create missing tables at startup. Production leaves the
+    # schema to `flask db upgrade` (see gunicorn.conf.py and Procfile)
+    AUTO_CREATE_TABLES = os.environ.get('AUTO_CREATE_TABLES', '1') == '1'
+
+    # Feed
+    FEED_PAGE_SIZE = int(os.environ.get('FEED_PAGE_SIZE', 20))
+    FEED_CACHE_WINDOW = int(os.environ.get('FEED_CACHE_WINDOW', 500))  # Newest post ids cached per tier
+    FEED_CACHE_TTL = int(os.environ.get('FEED_CACHE_TTL', 300))  # Seconds
+    # With CACHE_BACKEND=memory other workers miss create/delete invalidations: bound how stale they get
+    FEED_CACHE_LOCAL_TTL = int(os.environ.get('FEED_CACHE_LOCAL_TTL', 5))
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 2000))  # Rendered card fragments kept
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
+    FEED_INLINE_COMMENTS = int(os.environ.get('FEED_INLINE_COMMENTS', 3))  # Latest comments shipped with each card
+    COMMENTS_PAGE_SIZE = int(os.environ.get('COMMENTS_PAGE_SIZE', 20))  # Older comments per "load more"
+
+    # Like/save toggles: buffered in memory and written in batches (services/toggles.py)
+    LIKE_WRITE_BEHIND = os.environ.get('LIKE_WRITE_BEHIND', '0') == '1'
+    LIKE_FLUSH_INTERVAL = float(os.environ.get('LIKE_FLUSH_INTERVAL', 1))  # Seconds between batch writes
+    LIKE_FLUSH_MAX_PENDING = int(os.environ.get('LIKE_FLUSH_MAX_PENDING', 2000))  # Flush early past this many
+
+    # HTTP caching and compression
+    STATIC_IMMUTABLE_MAX_AGE = int(os.environ.get('STATIC_IMMUTABLE_MAX_AGE', 365 * 24 * 3600))  # ?v=<hash> assets, uploads
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # Bytes; smaller responses are sent as is
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))  # gzip, 1-9
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))  # brotli, 0-11
+
+    # Member directory
+    MEMBERS_PAGE_SIZE = int(os.environ.get('MEMBERS_PAGE_SIZE', 48))
+    MEMBER_SEARCH_LIMIT = int(os.environ.get('MEMBER_SEARCH_LIMIT', 10))  # Typeahead suggestions
+
+    # Post search
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+
+    # Admin console
+    ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+    MEMBER_STATS_TTL = int(os.environ.get('MEMBER_STATS_TTL', 30))  # Seconds
+
+    # Password hashing (werkzeug method syntax, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1')
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    # Per host: split evenly between the WEB_CONCURRENCY web workers (see services/passwords.py)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))  # 0 = inline
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 32))  # Pending hashes
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))  # Web worker processes on this host
+
+    # Identity cache for the login user loader
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))  # Seconds
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    # With CACHE_BACKEND=memory other workers never see invalidate_user(): bound how stale they get
+    USER_CACHE_LOCAL_TTL = int(os.environ.get('USER_CACHE_LOCAL_TTL', 5))
+
+    # Cache backend: 'memory' (per process) or 'redis' (shared across workers)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Live feed events over SSE: 'memory' (per process) or 'redis' (pub/sub across workers)
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'memory')
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL', CACHE_REDIS_URL)
+    EVENTS_REDIS_TIMEOUT = float(os.environ.get('EVENTS_REDIS_TIMEOUT', 0.5))  # Connect/socket seconds
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 1000))  # Open streams per process
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_COALESCE_SECONDS = float(os.environ.get('EVENTS_COALESCE_SECONDS', 1))
     
     # AWS S3 Configuration
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
     AWS_REGION = os.environ.get('AWS_REGION', 'ap-northeast-1')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')  # Set for S3-compatible stand-ins (MinIO, moto)
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 20))
+    S3_MULTIPART_THRESHOLD_MB = int(os.environ.get('S3_MULTIPART_THRESHOLD_MB', 8))
+    S3_MULTIPART_CHUNKSIZE_MB = int(os.environ.get('S3_MULTIPART_CHUNKSIZE_MB', 8))
+    S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', 4))
+    
+    # Direct-to-storage uploads (see routes/uploads.py)
+    UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+    UPLOAD_URL_EXPIRY = int(os.environ.get('UPLOAD_URL_EXPIRY', 600))  # Seconds a signed upload URL is valid
+    UPLOAD_CONFIRM_MAX_AGE = int(os.environ.get('UPLOAD_CONFIRM_MAX_AGE', 3600))  # Seconds to attach it to a post
+    UPLOAD_NONCE_MAX_AGE = int(os.environ.get('UPLOAD_NONCE_MAX_AGE', 1800))  # Registration form's avatar nonce
+    UPLOAD_ANON_PER_NONCE = int(os.environ.get('UPLOAD_ANON_PER_NONCE', 3))  # Avatar uploads per registration form
+    UPLOAD_ANON_PER_ADDR = int(os.environ.get('UPLOAD_ANON_PER_ADDR', 20))  # Unconfirmed anonymous uploads per IP
     
     # Toggle S3 usage (False by default -> uses local storage)
     USE_S3 = os.environ.get('USE_S3', 'False')
+
+    # Background image variant workers (needs Pillow)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    # Seconds a blob must stay unreferenced before `flask gc-blobs` deletes it
+    BLOB_GC_GRACE = int(os.environ.get('BLOB_GC_GRACE', 24 * 3600))
+
+    # SMS broadcasts (see services/sms.py)
+    SMS_PROVIDER = os.environ.get('SMS_PROVIDER', 'console')
+    SMS_CHUNK_SIZE = int(os.environ.get('SMS_CHUNK_SIZE', 1000))  # Recipients fetched per query
+    SMS_CONCURRENCY = int(os.environ.get('SMS_CONCURRENCY', 8))  # Parallel provider calls
+    SMS_RATE_PER_SECOND = float(os.environ.get('SMS_RATE_PER_SECOND', 50))
+    SMS_MAX_RETRIES = int(os.environ.get('SMS_MAX_RETRIES', 3))
+    # A 'sending' job without progress for this long lost its sender; must exceed one chunk's send time
+    SMS_STALE_AFTER = int(os.environ.get('SMS_STALE_AFTER', 600))
@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from services.replicas import RoutingSession
 
-db = SQLAlchemy()
+# Reads of @replica_reads views may go to a replica, see services/replicas.py
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 migrate = Migrate()
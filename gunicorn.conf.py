@@ -0,0 +1,80 @@
+"""
+Production gunicorn settings:
+
+    gunicorn -c gunicorn.conf.py 'app:create_app()'
+
+The app is loaded once in the master and forked into the workers. The
+schema comes from `flask db upgrade` (the Procfile release step), never
+from create_all at boot. Requests spend most of their time waiting on the
+database, S3 or the SMS gateway, so each worker serves several at once
+with threads (gthread).
+
+The live feed stream (/feed/events) keeps one connection open per viewer,
+which would cost a gthread worker a thread each. It gets a process of its
+own (the Procfile's `events` entry, GUNICORN_ROLE=events): gevent workers,
+where an idle stream is a greenlet of a few KB, so each holds thousands.
+Route /feed/events to it at the proxy/load balancer. Should a stream reach
+the web process anyway, it is capped to half the threads there and the rest
+are refused (503, retried by main.js with backoff). Events must reach
+viewers on every process, so the Redis broker is the default here
+(EVENTS_BACKEND=redis).
+
+gevent only suits PostgreSQL: a SQLite busy_timeout wait blocks every
+greenlet of the worker. GUNICORN_WORKER_CLASS=gevent also works for the
+web role; image resizing then runs on gevent's pool of OS threads (see
+services/images.py).
+"""
+import multiprocessing
+import os
+
+# 'web' serves everything; 'events' is the process the proxy sends /feed/events to
+role = os.environ.get('GUNICORN_ROLE', 'web')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent' if role == 'events' else 'gthread')
+if worker_class == 'gevent':
+    # Patch before the preloaded app imports socket/ssl users (boto3, redis, psycopg2)
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        # psycopg2 waits in C; let it yield to other greenlets while it does
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+# Read by config.Config when the app is preloaded below
+os.environ.setdefault('AUTO_CREATE_TABLES', '0')
+os.environ.setdefault('EVENTS_BACKEND', 'redis')
+
+if role == 'events':
+    bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+    # Streams are idle I/O: a couple of workers hold thousands of them
+    os.environ.setdefault('WEB_CONCURRENCY', os.environ.get('EVENTS_CONCURRENCY', '2'))
+else:
+    bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Read by config.Config: per-host limits (password hashing) are split between the workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('GUNICORN_THREADS', 4))  # gthread: keep <= DB pool size + overflow
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 2000))  # gevent, incl. idle streams
+if worker_class != 'gevent':
+    # Read by config.Config: leave threads free for ordinary requests
+    os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(1, threads // 2)))
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    # Connections opened in the master while preloading must not be shared
+    # between processes: drop them without closing the master's sockets
+    from extensions import db
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,38 @@
+"""post and comment full-text search index
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 09:12:07.806131
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(content, tokenize='trigram')")
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(content, tokenize='trigram')")
+        # FTS5 tables are separate from post/comment: backfill existing rows
+        op.execute("INSERT INTO post_fts (rowid, content) SELECT id, content FROM post")
+        op.execute("INSERT INTO comment_fts (rowid, content) SELECT id, content FROM comment")
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_post_content_fts ON post USING GIN (to_tsvector('simple', content))")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_comment_content_fts ON comment USING GIN (to_tsvector('simple', content))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS post_fts")
+        op.execute("DROP TABLE IF EXISTS comment_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_post_content_fts")
+        op.execute("DROP INDEX IF EXISTS ix_comment_content_fts")
@@ -6,25 +6,45 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))  # scrypt hashes exceed 128 chars
     
     # Roles: 'free', 'paid', 'admin', 'owner'
-    role = db.Column(db.String(20), default='free', nullable=False)
+    role = db.Column(db.String(20), default='free', nullable=False, index=True)
     
     # SMS & Profile
     phone_number = db.Column(db.String(20), nullable=True)
     avatar_path = db.Column(db.String(200), nullable=True)  # Profile icon path
-    sms_opt_in = db.Column(db.Boolean, default=False)
+    avatar_thumb_path = db.Column(db.String(200), nullable=True)  # 80px variant, set by services/images
+    sms_opt_in = db.Column(db.Boolean, default=False, index=True)
     
     # Admin/Owner specific
     sms_credits = db.Column(db.Integer, default=0)  # Prepaid credits
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Member directory order
     
     # Password reset
-    reset_token = db.Column(db.String(100), nullable=True)
+    reset_token = db.Column(db.String(100), nullable=True, index=True)
     reset_token_expiry = db.Column(db.DateTime, nullable=True)
 
+    @property
+    def avatar_display_path(self):
+        # The original is shown until the resized variant has been generated
+        return self.avatar_thumb_path or self.avatar_path
+
+    @staticmethod
+    def prefix_filter(column, prefix):
+        """Index-friendly "starts with": a range scan on column's b-tree index.
+
+        Unlike LIKE 'x%', this uses a plain index on both SQLite and Postgres.
+        """
+        return db.and_(column >= prefix, column < prefix + '\U0010ffff')
+
+    @classmethod
+    def search(cls, prefix):
+        """Users whose username or email starts with prefix."""
+        return cls.query.filter(db.or_(cls.prefix_filter(cls.username, prefix),
+                                       cls.prefix_filter(cls.email, prefix)))
+
     def is_paid_user(self):
         return self.role in ['paid', 'admin', 'owner']
 
@@ -39,6 +59,9 @@ class Post(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     image_path = db.Column(db.String(255), nullable=True)
+    # Resized variants, set by services/images once processing finishes
+    image_thumb_path = db.Column(db.String(255), nullable=True)
+    image_feed_path = db.Column(db.String(255), nullable=True)
     
     # Post type: 'normal', 'announcement'
     post_type = db.Column(db.String(20), default='normal')
@@ -47,14 +70,51 @@ class Post(db.Model):
     visibility = db.Column(db.String(20), default='all')
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Denormalized counters, kept in step by SQL increments (see adjust_counters)
+    like_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    comment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    # Bumped on edit, comment or like so cached card fragments are re-rendered
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     author = db.relationship('User', backref=db.backref('posts', lazy=True))
     comments = db.relationship('Comment', backref='post', lazy=True, cascade="all, delete-orphan")
     likes = db.relationship('Like', backref='post', lazy=True, cascade="all, delete-orphan")
 
+    # Feed order for paid viewers (all posts) and for everyone else (visibility='all')
+    __table_args__ = (
+        db.Index('ix_post_created_at_id', created_at.desc(), id.desc()),
+        db.Index('ix_post_visibility_created_at_id', visibility, created_at.desc(), id.desc()),
+    )
+
+    @classmethod
+    def visible_to(cls, user):
+        """Query of posts the given user may see in the feed."""
+        if user.is_paid_user():
+            return cls.query
+        return cls.query.filter_by(visibility='all')
+
+    @classmethod
+    def adjust_counters(cls, post_id, **deltas):
+        """Atomically add deltas to counter columns, e.g. like_count=1.
+
+        Runs as a single UPDATE ... SET col = col + :delta so concurrent
+        writers never lose increments. Flushed with the current transaction.
+        """
+        values = {getattr(cls, name): getattr(cls, name) + delta for name, delta in deltas.items()}
+        values[cls.updated_at] = datetime.utcnow()
+        cls.query.filter_by(id=post_id).update(values, synchronize_session=False)
+
+    @property
+    def image_display_path(self):
+        return self.image_feed_path or self.image_path
+
     @property
-    def like_count(self):
-        return len(self.likes)
+    def fragment_version(self):
+        """Changes whenever anything shown in the cached card fragments changes."""
+        stamp = (self.updated_at or self.created_at).isoformat()
+        return f"{stamp}:{self.author.role}:{self.author.avatar_display_path}"
 
     def is_liked_by(self, user):
         return Like.query.filter_by(user_id=user.id, post_id=self.id).first() is not None
@@ -71,29 +131,115 @@ class Comment(db.Model):
     
     author = db.relationship('User', backref=db.backref('comments', lazy=True))
 
+    # A post's comments, in order
+    __table_args__ = (db.Index('ix_comment_post_id_created_at', post_id, created_at),)
+
 class SMSLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     target_count = db.Column(db.Integer, nullable=False)
     cost = db.Column(db.Integer, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Dashboard history
+
+    # Broadcast job state, advanced by services/sms.py
+    # Status: 'queued', 'sending', 'completed', 'failed'
+    status = db.Column(db.String(20), default='queued', server_default='completed', nullable=False)
+    sent_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    failed_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    retry_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    last_user_id = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Resume cursor
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Last progress of the sender holding the job
+    error = db.Column(db.Text, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
     
     sender = db.relationship('User', backref=db.backref('sms_logs', lazy=True))
 
+    @property
+    def progress(self):
+        """Share of recipients processed, 0-100."""
+        if not self.target_count:
+            return 100
+        return min(100, (self.sent_count + self.failed_count) * 100 // self.target_count)
+
+class CreditLedger(db.Model):
+    """Append-only record of SMS credit changes.
+
+    User.sms_credits is the materialized sum of a user's entries; it is only
+    changed together with a new entry (see services/credits.py).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    delta = db.Column(db.Integer, nullable=False)
+    # Reason: 'opening_balance', 'owner_grant', 'topup', 'sms_broadcast', 'adjustment'
+    reason = db.Column(db.String(30), nullable=False)
+    sms_log_id = db.Column(db.Integer, db.ForeignKey('sms_log.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship('User', backref=db.backref('credit_entries', lazy='dynamic'))
+    sms_log = db.relationship('SMSLog')
+
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Unique constraint to prevent double likes
+    # Unique constraint to prevent double likes (also serves lookups by user_id)
     __table_args__ = (db.UniqueConstraint('user_id', 'post_id', name='_user_post_uc'),)
 
+    @classmethod
+    def post_ids_for(cls, user, post_ids):
+        """Set of the given post ids that the user has liked, in one query."""
+        if not post_ids:
+            return set()
+        rows = db.session.query(cls.post_id).filter(
+            cls.user_id == user.id, cls.post_id.in_(post_ids))
+        return {post_id for (post_id,) in rows}
+
 class SavedPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Also serves lookups by user_id; post_id (deletes) has its own index
     __table_args__ = (db.UniqueConstraint('user_id', 'post_id', name='_user_post_saved_uc'),)
+
+    @classmethod
+    def post_ids_for(cls, user, post_ids):
+        """Set of the given post ids that the user has saved, in one query."""
+        if not post_ids:
+            return set()
+        rows = db.session.query(cls.post_id).filter(
+            cls.user_id == user.id, cls.post_id.in_(post_ids))
+        return {post_id for (post_id,) in rows}
+
+class Blob(db.Model):
+    """A stored upload, shared by every row that references it."""
+    id = db.Column(db.Integer, primary_key=True)
+    # sha256 hex + extension, or the random key of a confirmed direct upload
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Last release of a reference; gc waits BLOB_GC_GRACE seconds after it
+    released_at = db.Column(db.DateTime, nullable=True)
+
+class PendingUpload(db.Model):
+    """A signed direct upload not attached to a Post/User yet (services/uploads.py).
+
+    Rows left behind once the confirm token has expired are deleted, with
+    their stored object, by `flask gc-blobs`.
+    """
+    key = db.Column(db.String(100), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    # Anonymous (registration) avatars: the signed nonce of the form, and the client address
+    nonce = db.Column(db.String(32), nullable=True, index=True)
+    remote_addr = db.Column(db.String(45), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+# Full-text search tables/indexes (services/search.py) follow create_all/drop_all
+from services.search import attach_search_ddl  # noqa: E402
+attach_search_ddl(db.metadata)
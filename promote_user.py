@@ -9,7 +9,9 @@ with app.app_context():
     if user:
         print(f"Found user: {user.username} (Current Role: {user.role})")
         user.role = 'owner'
-        user.sms_credits = 100  # Give them credits to test SMS
+        # Give them credits to test SMS (top up to 100 through the ledger)
+        from services.credits import credit
+        credit(user.id, 100 - (user.sms_credits or 0), 'adjustment')
         db.session.commit()
         print(f"Successfully promoted {user.username} to OWNER.")
     else:
@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify, current_app
 from flask_login import login_required, current_user
 from extensions import db
 from models import User, SMSLog
+from services.cache import cache_stats
+from services.sms import start_broadcast
+from services.credits import InsufficientCredits, debit, credit, current_balance
+from services.stats import member_stats, invalidate_member_stats
+from services.users import invalidate_user
+from services.replicas import replica_reads
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -12,11 +18,39 @@ def require_admin():
         abort(403)
 
 @admin_bp.route('/')
+@replica_reads
 def dashboard():
-    users = User.query.all()
-    opted_in_count = User.query.filter_by(sms_opt_in=True).count()
+    q = request.args.get('q', '').strip()
+    role = request.args.get('role', '')
+    opt_in = request.args.get('opt_in', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = current_app.config['ADMIN_PAGE_SIZE']
+    
+    query = User.search(q) if q else User.query
+    if role:
+        query = query.filter(User.role == role)
+    if opt_in:
+        query = query.filter(User.sms_opt_in == (opt_in == 'yes'))
+    
+    # Fetch one extra row instead of counting the whole filtered table
+    rows = (query.order_by(User.id.desc())
+            .offset((max(page, 1) - 1) * per_page)
+            .limit(per_page + 1)
+            .all())
+    users = rows[:per_page]
+    has_next = len(rows) > per_page
+    
+    stats = member_stats()
     sms_logs = SMSLog.query.order_by(SMSLog.timestamp.desc()).limit(5).all()
-    return render_template('admin/dashboard.html', users=users, opted_in_count=opted_in_count, sms_logs=sms_logs)
+    return render_template('admin/dashboard.html', users=users, stats=stats,
+                           opted_in_count=stats['opted_in'], sms_logs=sms_logs,
+                           page=page, has_next=has_next,
+                           filters={'q': q, 'role': role, 'opt_in': opt_in})
+
+@admin_bp.route('/cache/stats')
+def cache_statistics():
+    # Per-process counters; each gunicorn worker reports its own
+    return jsonify(cache_stats())
 
 @admin_bp.route('/user/<int:user_id>/role', methods=['POST'])
 def update_role(user_id):
@@ -33,6 +67,8 @@ def update_role(user_id):
         
     user.role = new_role
     db.session.commit()
+    invalidate_member_stats()
+    invalidate_user(user.id)
     flash(f'Updated {user.username} role to {new_role}', 'success')
     return redirect(url_for('admin.dashboard'))
 
@@ -45,47 +81,60 @@ def send_sms():
         flash('Confirmation failed. Type "SEND" exactly.', 'error')
         return redirect(url_for('admin.dashboard'))
     
-    # Calculate Cost
-    targets = User.query.filter_by(sms_opt_in=True).all()
-    count = len(targets)
+    # Calculate Cost (recipients themselves are streamed by the sender)
+    count = User.query.filter_by(sms_opt_in=True).count()
     cost = count * 1 # 1 credit per user
     
     if count == 0:
         flash('No users have opted in for SMS.', 'warning')
         return redirect(url_for('admin.dashboard'))
         
-    if current_user.sms_credits < cost:
-        flash(f'Insufficient credits. Need {cost}, have {current_user.sms_credits}.', 'error')
-        return redirect(url_for('admin.dashboard'))
-    
-    # Deduct Logic
-    current_user.sms_credits -= cost
-    
-    # Log
+    # Persist the broadcast as a job
     log = SMSLog(
         sender_id=current_user.id,
         content=message,
         target_count=count,
-        cost=cost
+        cost=cost,
+        status='queued'
     )
     db.session.add(log)
+    
+    # Deduct Logic: conditional atomic debit, recorded in the ledger
+    try:
+        debit(current_user.id, cost, 'sms_broadcast', sms_log=log)
+    except InsufficientCredits:
+        db.session.rollback()
+        flash(f'Insufficient credits. Need {cost}, have {current_balance(current_user.id)}.', 'error')
+        return redirect(url_for('admin.dashboard'))
     db.session.commit()
+    invalidate_user(current_user.id)  # Balance changed
     
-    # Mock Sending Logic (Integration point for Twilio)
-    print(f"--- MOCK SMS SENDING ---")
-    print(f"Message: {message}")
-    print(f"Targets: {[u.phone_number for u in targets]}")
-    print(f"------------------------")
+    start_broadcast(log.id)
     
-    flash(f'SMS Sent successfully to {count} users. Cost: {cost} credits.', 'success')
+    flash(f'SMS broadcast to {count} users queued. Cost: {cost} credits.', 'success')
     return redirect(url_for('admin.dashboard'))
 
+@admin_bp.route('/sms/<int:log_id>/status')
+def sms_status(log_id):
+    log = SMSLog.query.get_or_404(log_id)
+    return jsonify({
+        'id': log.id,
+        'status': log.status,
+        'target_count': log.target_count,
+        'sent_count': log.sent_count,
+        'failed_count': log.failed_count,
+        'retry_count': log.retry_count,
+        'progress': log.progress,
+        'error': log.error
+    })
+
 @admin_bp.route('/credits/add', methods=['POST'])
 def add_credits():
     if not current_user.is_owner():
         abort(403)
         
-    current_user.sms_credits += 100
+    credit(current_user.id, 100, 'topup')
     db.session.commit()
+    invalidate_user(current_user.id)
     flash('Added 100 credits.', 'success')
     return redirect(url_for('admin.dashboard'))
@@ -1,8 +1,8 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user, login_required, current_user
 from extensions import db
 from models import User
+from services.passwords import HashingBusy, hash_password, verify_password, needs_rehash
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -25,31 +25,63 @@ def register():
             flash('Username already taken', 'error')
             return redirect(url_for('auth.register'))
             
+        # Hash first: a busy refusal must not leave a stored avatar behind
+        try:
+            password_hash = hash_password(password)
+        except HashingBusy:
+            flash('混み合っています。しばらくしてから再度お試しください。', 'error')
+            return redirect(url_for('auth.register'))
+        
         # Handle avatar upload
         avatar_path = None
+        spool_path = None
+        upload_key = None
         if avatar_file and avatar_file.filename:
             from routes.feed import save_picture
+            from services.images import spool_upload
+            spool_path = spool_upload(avatar_file)
             avatar_path = save_picture(avatar_file)
+        elif request.form.get('avatar_token'):
+            # Avatar was already uploaded straight to storage (routes/uploads.py)
+            from services.uploads import confirm_upload
+            from services.storage import get_storage_provider
+            upload_key = confirm_upload(request.form['avatar_token'], 'avatar', None)
+            if upload_key:
+                avatar_path = get_storage_provider().url_for_key(upload_key)
         
         new_user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password, method='pbkdf2:sha256'),
+            password_hash=password_hash,
             avatar_path=avatar_path
         )
         
         # First user is Owner
-        if User.query.count() == 0:
+        is_first_user = User.query.count() == 0
+        if is_first_user:
             new_user.role = 'owner'
-            new_user.sms_credits = 100 # Default credits for owner
         
         db.session.add(new_user)
+        if is_first_user:
+            from services.credits import credit
+            db.session.flush()
+            credit(new_user.id, 100, 'owner_grant') # Default credits for owner
         db.session.commit()
         
+        from services.stats import invalidate_member_stats
+        invalidate_member_stats()
+        
+        from services.images import schedule_variants, schedule_stored_variants
+        if upload_key:
+            schedule_stored_variants(new_user, upload_key)
+        else:
+            schedule_variants(new_user, spool_path)
+        
         login_user(new_user)
         return redirect(url_for('feed.feed'))
         
-    return render_template('register.html')
+    from services.uploads import registration_nonce
+    return render_template('register.html', upload_nonce=registration_nonce())
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -62,9 +94,23 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if not user or not check_password_hash(user.password_hash, password):
+        try:
+            valid = user is not None and verify_password(user.password_hash, password)
+        except HashingBusy:
+            flash('ログインが混み合っています。しばらくしてから再度お試しください。', 'error')
+            return redirect(url_for('auth.login'))
+        
+        if not valid:
             flash('Please check your login details and try again.', 'error')
             return redirect(url_for('auth.login'))
+        
+        # Upgrade hashes made with older parameters while we have the password
+        if needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hash_password(password)
+                db.session.commit()
+            except HashingBusy:
+                pass  # Upgraded on a later login
             
         login_user(user)
         return redirect(url_for('feed.feed'))
@@ -124,7 +170,11 @@ def reset_password(token):
             return render_template('reset_password.html')
         
         # Update password and clear token
-        user.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        try:
+            user.password_hash = hash_password(password)
+        except HashingBusy:
+            flash('混み合っています。しばらくしてから再度お試しください。', 'error')
+            return render_template('reset_password.html')
         user.reset_token = None
         user.reset_token_expiry = None
         db.session.commit()
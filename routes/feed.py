@@ -1,34 +1,117 @@
-import os
-import secrets
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
+from flask import Blueprint, Response, render_template, redirect, url_for, flash, request, current_app, jsonify, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from extensions import db
 from models import Post
 from services.storage import get_storage_provider
+from services.blobstore import get_blob_store
+from services.feed import load_feed_page, feed_page_stamp, feed_tier, invalidate_feed_cache
+from services.comments import load_comment_page
+from services.images import image_srcset, spool_upload, schedule_variants, schedule_stored_variants
+from services.uploads import confirm_upload
+from services.search import get_search_backend, search_posts
+from services.replicas import replica_reads
+from services.storage import media_url
+from services.http_cache import conditional
+from services.events import open_stream, publish_post, publish_counts
+from services.toggles import buffered_toggle
 
 feed_bp = Blueprint('feed', __name__)
 
 def save_picture(form_picture):
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-    
-    storage = get_storage_provider()
-    return storage.save(form_picture, picture_fn)
+    # Stored under its content hash; identical uploads share one object
+    return get_blob_store().save(form_picture, form_picture.filename)
+
+def _wants_json():
+    return request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+def _comment_json(comment):
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat(),
+    }
+
+def _post_json(post, liked=False, saved=False, thread=None):
+    # Compact card payload for main.js; per-viewer flags come from the FeedPage
+    return {
+        'id': post.id,
+        'author': {
+            'username': post.author.username,
+            'role': post.author.role,
+            'avatar_url': media_url(post.author.avatar_display_path),
+        },
+        'content': post.content,
+        'image_url': media_url(post.image_display_path),
+        'image_srcset': image_srcset(post),
+        'visibility': post.visibility,
+        'created_at': post.created_at.isoformat(),
+        'like_count': post.like_count,
+        'comment_count': post.comment_count,
+        'liked': liked,
+        'saved': saved,
+        'can_delete': current_user.is_admin() or current_user.id == post.author_id,
+        'comments': [_comment_json(c) for c in thread.comments] if thread else [],
+        'comments_cursor': thread.next_cursor if thread else None,
+        'urls': {
+            'like': url_for('feed.toggle_like', post_id=post.id),
+            'save': url_for('feed.toggle_save', post_id=post.id),
+            'delete': url_for('feed.delete_post', post_id=post.id),
+            'comment': url_for('feed.add_comment', post_id=post.id),
+            'comments': url_for('feed.post_comments', post_id=post.id),
+        },
+    }
+
+def _feed_stamp():
+    return feed_page_stamp(current_user, request.args.get('cursor'), current_app.config['FEED_PAGE_SIZE'])
 
 @feed_bp.route('/feed')
 @login_required
+@replica_reads
+@conditional(_feed_stamp)
 def feed():
-    # Role-based visibility logic
-    if current_user.is_paid_user():
-        # See all posts
-        posts = Post.query.order_by(Post.created_at.desc()).all()
-    else:
-        # See only public posts
-        posts = Post.query.filter_by(visibility='all').order_by(Post.created_at.desc()).all()
+    # Role-based visibility is applied inside load_feed_page
+    cursor = request.args.get('cursor')
+    page_size = current_app.config['FEED_PAGE_SIZE']
+    try:
+        page = load_feed_page(current_user, cursor, page_size)
+    except ValueError:
+        # Stale or tampered cursor: start again from the top
+        return redirect(url_for('feed.feed'))
     
-    return render_template('feed.html', posts=posts)
+    return render_template('feed.html', posts=page.posts, page=page)
+
+@feed_bp.route('/feed.json')
+@login_required
+@replica_reads
+def feed_json():
+    # Same pages as feed(), for infinite scroll
+    try:
+        page = load_feed_page(current_user, request.args.get('cursor'),
+                              current_app.config['FEED_PAGE_SIZE'])
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid cursor'}), 400
+    return jsonify({
+        'status': 'success',
+        'posts': [_post_json(post, post.id in page.liked_ids, post.id in page.saved_ids,
+                             page.comments[post.id])
+                  for post in page.posts],
+        'next_cursor': page.next_cursor,
+    })
+
+@feed_bp.route('/feed/events')
+@login_required
+def feed_events():
+    # Live new-post notices and count deltas; see services/events.py
+    stream = open_stream(feed_tier(current_user), current_user.id)
+    if stream is None:
+        return Response(status=503, headers={'Retry-After': '30'})
+    # The app context (and its DB session) is gone once streaming starts
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @feed_bp.route('/post/new', methods=['POST'])
 @login_required
@@ -38,12 +121,27 @@ def create_post():
     image_file = request.files.get('image')
     
     if not content:
+        if _wants_json():
+            return jsonify({'status': 'error', 'message': 'Post content cannot be empty'}), 400
         flash('Post content cannot be empty', 'error')
         return redirect(url_for('feed.feed'))
         
     image_path = None
+    spool_path = None
+    upload_key = None
     if image_file and image_file.filename:
+        spool_path = spool_upload(image_file)
         image_path = save_picture(image_file)
+    elif request.form.get('upload_token'):
+        # Image was already uploaded straight to storage (routes/uploads.py)
+        upload_key = confirm_upload(request.form['upload_token'], 'post', current_user.id)
+        if upload_key is None:
+            message = '画像のアップロードを確認できませんでした。もう一度お試しください。'
+            if _wants_json():
+                return jsonify({'status': 'error', 'message': message}), 400
+            flash(message, 'error')
+            return redirect(url_for('feed.feed'))
+        image_path = get_storage_provider().url_for_key(upload_key)
         
     post = Post(
         content=content, 
@@ -53,31 +151,70 @@ def create_post():
     )
     
     db.session.add(post)
+    db.session.flush()
+    get_search_backend().index_post(post.id, content)
     db.session.commit()
+    invalidate_feed_cache(visibility)
+    publish_post(post)
+    # Resized variants replace the original in the feed once ready
+    if upload_key:
+        schedule_stored_variants(post, upload_key)
+    else:
+        schedule_variants(post, spool_path)
+
+    if _wants_json():
+        return jsonify({'status': 'success', 'post': _post_json(post)})
     
     flash('Post created!', 'success')
     return redirect(url_for('feed.feed'))
 
+def _buffered_toggle(kind, post_id):
+    # Write-behind mode: no write transaction here, see services/toggles.py
+    result = buffered_toggle(kind, current_user.id, post_id)
+    if result is None:
+        abort(404)
+    active, like_count, visibility = result
+    if kind == 'like':
+        publish_counts(post_id, visibility, current_user.id, likes=1 if active else -1)
+    if _wants_json():
+        if kind == 'like':
+            return jsonify({'status': 'success', 'is_liked': active, 'like_count': like_count})
+        return jsonify({'status': 'success', 'is_saved': active})
+    return redirect(url_for('feed.feed', _anchor=f'post-{post_id}'))
+
 @feed_bp.route('/post/<int:post_id>/like', methods=['POST'])
 @login_required
 def toggle_like(post_id):
     from models import Like
-    post = Post.query.get_or_404(post_id)
+    if current_app.config['LIKE_WRITE_BEHIND']:
+        return _buffered_toggle('like', post_id)
+    visibility = Post.query.get_or_404(post_id).visibility
     like = Like.query.filter_by(user_id=current_user.id, post_id=post_id).first()
     
-    if like:
-        db.session.delete(like)
+    try:
+        if like:
+            db.session.delete(like)
+        else:
+            db.session.add(Like(user_id=current_user.id, post_id=post_id))
+        # Flush explicitly: the counter UPDATE would otherwise autoflush the
+        # Like row and raise a conflict outside this handler
+        db.session.flush()
+        Post.adjust_counters(post_id, like_count=-1 if like else 1)
+        db.session.commit()
+    except (IntegrityError, StaleDataError):
+        # A concurrent toggle by the same user won the race; report its result
+        db.session.rollback()
+        is_liked = Like.query.filter_by(user_id=current_user.id, post_id=post_id).first() is not None
     else:
-        new_like = Like(user_id=current_user.id, post_id=post_id)
-        db.session.add(new_like)
-        
-    db.session.commit()
+        is_liked = not like
+        publish_counts(post_id, visibility, current_user.id, likes=1 if is_liked else -1)
     
-    if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if _wants_json():
+        like_count = db.session.query(Post.like_count).filter_by(id=post_id).scalar()
         return jsonify({
             'status': 'success',
-            'is_liked': not bool(like),
-            'like_count': post.like_count
+            'is_liked': is_liked,
+            'like_count': like_count
         })
         
     return redirect(url_for('feed.feed', _anchor=f'post-{post_id}'))
@@ -88,19 +225,50 @@ def add_comment(post_id):
     from models import Comment
     content = request.form.get('content')
     if not content:
+        if _wants_json():
+            return jsonify({'status': 'error', 'message': 'コメントを入力してください'}), 400
         flash('コメントを入力してください', 'error')
         return redirect(url_for('feed.feed'))
         
     comment = Comment(content=content, author=current_user, post_id=post_id)
     db.session.add(comment)
+    db.session.flush()
+    get_search_backend().index_comment(comment.id, content)
+    Post.adjust_counters(post_id, comment_count=1)
     db.session.commit()
+    visibility = db.session.query(Post.visibility).filter_by(id=post_id).scalar()
+    publish_counts(post_id, visibility, current_user.id, comments=1)
+
+    if _wants_json():
+        comment_count = db.session.query(Post.comment_count).filter_by(id=post_id).scalar()
+        return jsonify({'status': 'success', 'comment': _comment_json(comment),
+                        'comment_count': comment_count})
     
     return redirect(url_for('feed.feed', _anchor=f'post-{post_id}'))
 
+@feed_bp.route('/post/<int:post_id>/comments')
+@login_required
+@replica_reads
+def post_comments(post_id):
+    # Older comments of a card, newest first; the card itself carries the latest few
+    Post.visible_to(current_user).filter_by(id=post_id).with_entities(Post.id).first_or_404()
+    try:
+        page = load_comment_page(post_id, request.args.get('cursor'),
+                                 current_app.config['COMMENTS_PAGE_SIZE'])
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid cursor'}), 400
+    return jsonify({
+        'status': 'success',
+        'comments': [_comment_json(c) for c in page.comments],
+        'next_cursor': page.next_cursor,
+    })
+
 @feed_bp.route('/post/<int:post_id>/save', methods=['POST'])
 @login_required
 def toggle_save(post_id):
     from models import SavedPost
+    if current_app.config['LIKE_WRITE_BEHIND']:
+        return _buffered_toggle('save', post_id)
     post = Post.query.get_or_404(post_id)
     saved = SavedPost.query.filter_by(user_id=current_user.id, post_id=post_id).first()
     
@@ -112,7 +280,7 @@ def toggle_save(post_id):
         
     db.session.commit()
     
-    if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if _wants_json():
         return jsonify({
             'status': 'success',
             'is_saved': not bool(saved)
@@ -127,7 +295,30 @@ def delete_post(post_id):
     if post.author != current_user and not current_user.is_admin():
         abort(403)
     
+    # Bulk-delete dependents in SQL instead of loading them through the cascade
+    from models import Comment, Like, SavedPost
+    get_search_backend().remove_post(post.id)
+    for model in (Comment, Like, SavedPost):
+        model.query.filter_by(post_id=post.id).delete(synchronize_session=False)
+    visibility = post.visibility
+    if post.image_path:
+        get_blob_store().release(post.image_path)
     db.session.delete(post)
     db.session.commit()
+    invalidate_feed_cache(visibility)
     flash('Post has been deleted!', 'success')
     return redirect(url_for('feed.feed'))
+
+@feed_bp.route('/search')
+@login_required
+@replica_reads
+def search():
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    page = max(page, 1)
+    posts, has_next = [], False
+    if query:
+        posts, has_next = search_posts(current_user, query, page,
+                                       current_app.config['SEARCH_PAGE_SIZE'])
+    return render_template('search.html', query=query, posts=posts, page=page, has_next=has_next,
+                           min_length=get_search_backend().MIN_TERM_LENGTH)
@@ -0,0 +1,64 @@
+from flask import Blueprint, request, jsonify, abort
+from flask_login import current_user
+from itsdangerous import BadSignature
+from extensions import db
+from models import PendingUpload
+from services.storage import get_storage_provider, LocalStorage
+from services.uploads import (
+    IMAGE_TYPES, UPLOAD_KINDS, anonymous_upload_allowed, check_registration_nonce,
+    issue_upload, load_local_upload,
+)
+
+uploads_bp = Blueprint('uploads', __name__, url_prefix='/uploads')
+
+@uploads_bp.route('/sign', methods=['POST'])
+def sign():
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    content_type = data.get('content_type') or ''
+
+    if kind not in UPLOAD_KINDS or content_type not in IMAGE_TYPES:
+        return jsonify({'status': 'error', 'message': 'Unsupported upload'}), 400
+
+    if current_user.is_authenticated:
+        target = issue_upload(kind, content_type, current_user.id)
+        return jsonify({'status': 'success', **target})
+
+    # Avatars are uploaded from the registration form, before login, with its nonce
+    nonce = check_registration_nonce(data.get('nonce') or '')
+    if kind != 'avatar' or nonce is None:
+        abort(401)
+    if not anonymous_upload_allowed(nonce, request.remote_addr):
+        return jsonify({'status': 'error', 'message': 'Too many uploads'}), 429
+
+    target = issue_upload(kind, content_type, None, nonce=nonce, remote_addr=request.remote_addr)
+    return jsonify({'status': 'success', **target})
+
+@uploads_bp.route('/local/<token>', methods=['PUT'])
+def local_upload(token):
+    # Local stand-in for a presigned S3 URL
+    storage = get_storage_provider()
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+
+    try:
+        data = load_local_upload(token)
+    except BadSignature:
+        abort(403)
+
+    # Only a signed, unconfirmed key may be written, and only once: confirmed
+    # objects are public and cached as immutable
+    if db.session.get(PendingUpload, data['key']) is None:
+        abort(404)
+    if storage.exists(data['key']):
+        abort(409)
+    if request.mimetype != data['type']:
+        abort(415)
+    try:
+        saved = storage.save_stream(request.stream, data['key'], data['max'], data['type'])
+    except ValueError:
+        abort(415)  # Not the image it was signed for
+    if not saved:
+        abort(413)
+
+    return jsonify({'status': 'success', 'key': data['key']})
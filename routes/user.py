@@ -1,16 +1,72 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import and_, or_
 from extensions import db
 from models import User
+from services.feed import encode_cursor, decode_cursor
+from services.stats import member_stats, invalidate_member_stats
+from services.users import invalidate_user
+from services.storage import media_url
+from services.replicas import replica_reads
+from services.http_cache import conditional
 
 user_bp = Blueprint('user', __name__)
 
+def _members_page_query():
+    """Keyset page query for ?cursor=, newest members first. Raises ValueError on a bad cursor."""
+    query = User.query
+    cursor = request.args.get('cursor')
+    if cursor:
+        created_at, user_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            User.created_at < created_at,
+            and_(User.created_at == created_at, User.id < user_id),
+        ))
+    # One extra row tells if there is more
+    return (query.order_by(User.created_at.desc(), User.id.desc())
+            .limit(current_app.config['MEMBERS_PAGE_SIZE'] + 1))
+
+def _members_stamp():
+    # Only the columns members.html shows
+    rows = _members_page_query().with_entities(User.id, User.username, User.role, User.avatar_path,
+                                               User.avatar_thumb_path, User.created_at)
+    return [list(row) for row in rows] + [member_stats()['total']]
+
 @user_bp.route('/members')
 @login_required
+@replica_reads
+@conditional(_members_stamp)
 def members():
-    from models import User
-    users = User.query.order_by(User.created_at.desc()).all()
-    return render_template('members.html', users=users)
+    page_size = current_app.config['MEMBERS_PAGE_SIZE']
+    try:
+        rows = _members_page_query().all()
+    except ValueError:
+        return redirect(url_for('user.members'))
+    users = rows[:page_size]
+    next_cursor = encode_cursor(users[-1]) if len(rows) > page_size else None
+    
+    return render_template('members.html', users=users, next_cursor=next_cursor,
+                           member_count=member_stats()['total'])
+
+@user_bp.route('/members/search')
+@login_required
+@replica_reads
+def member_search():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify([])
+    
+    users = (User.query
+             .filter(User.prefix_filter(User.username, q))
+             .order_by(User.username)
+             .limit(current_app.config['MEMBER_SEARCH_LIMIT'])
+             .all())
+    return jsonify([{
+        'id': u.id,
+        'username': u.username,
+        'role': u.role,
+        'avatar_url': media_url(u.avatar_display_path)
+    } for u in users])
 
 @user_bp.route('/settings')
 @login_required
@@ -34,6 +90,8 @@ def update_profile():
     current_user.sms_opt_in = sms_opt_in
     
     db.session.commit()
+    invalidate_member_stats()
+    invalidate_user(current_user.id)
     flash('Profile updated successfully.', 'success')
     return redirect(url_for('user.settings'))
 
@@ -48,4 +106,6 @@ def toggle_sub():
         flash('Downgraded to Free.', 'info')
         
     db.session.commit()
+    invalidate_member_stats()
+    invalidate_user(current_user.id)
     return redirect(url_for('user.settings'))
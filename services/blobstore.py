@@ -0,0 +1,99 @@
+"""
+Content-addressed, deduplicating upload store.
+Uploads are hashed while they are streamed to a spool file and stored under
+their SHA-256, so an image uploaded 500 times is written once. Each Blob row
+counts the Post/User rows pointing at it; `flask gc-blobs` removes blobs that
+nothing has referenced for BLOB_GC_GRACE seconds. The grace period keeps a
+blob that is being referenced again (save() found the object and is about to
+add its reference) from being deleted underneath it.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import FileStorage
+from extensions import db
+from services.storage import get_storage_provider
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024  # Larger uploads spill to a temp file while hashing
+
+
+def variant_keys(key):
+    """Storage keys of the resized variants derived from a blob (services/images).
+
+    Variants are named after the blob key's stem, so other blobs never share them.
+    """
+    from services.images import POST_VARIANTS, AVATAR_VARIANTS
+    digest = os.path.splitext(key)[0]
+    return [f"{digest}_{name}.webp" for name in (*POST_VARIANTS, *AVATAR_VARIANTS)]
+
+
+def key_for_path(path):
+    """Blob key of a stored image path/URL (its last path segment)."""
+    return path.rsplit('/', 1)[-1] if path else None
+
+
+class ContentAddressedStorage:
+    def __init__(self, base):
+        self.base = base
+
+    def save(self, file_storage, filename):
+        """Store an upload by content hash and take a reference to it.
+
+        The reference is added to the current session, so it is committed
+        together with the Post/User that points at the returned path.
+        """
+        _, ext = os.path.splitext(filename)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+            while chunk := file_storage.stream.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                spool.write(chunk)
+
+            key = digest.hexdigest() + ext.lower()
+            stored = self.base.exists(key)
+            if not stored:
+                self._write(spool, key, file_storage.content_type)
+            if self.add_reference(key, size) and stored:
+                # No Blob row: gc may have just removed the object we found
+                self._write(spool, key, file_storage.content_type)
+
+        return self.base.url_for_key(key)
+
+    def _write(self, spool, key, content_type):
+        spool.seek(0)
+        self.base.save(FileStorage(stream=spool, filename=key, content_type=content_type), key)
+
+    def add_reference(self, key, size):
+        """Count one more reference to key; True if its Blob row had to be created."""
+        from models import Blob
+        updated = Blob.query.filter_by(key=key).update(
+            {Blob.ref_count: Blob.ref_count + 1, Blob.released_at: None}, synchronize_session=False)
+        if updated:
+            return False
+        try:
+            with db.session.begin_nested():
+                db.session.add(Blob(key=key, size=size, ref_count=1))
+        except IntegrityError:
+            # Another request created the row first
+            Blob.query.filter_by(key=key).update(
+                {Blob.ref_count: Blob.ref_count + 1, Blob.released_at: None}, synchronize_session=False)
+            return False
+        return True
+
+    def release(self, path):
+        """Drop one reference to the blob behind a stored path, if it is one."""
+        from models import Blob
+        key = key_for_path(path)
+        if key:
+            Blob.query.filter_by(key=key).update(
+                {Blob.ref_count: Blob.ref_count - 1, Blob.released_at: datetime.utcnow()},
+                synchronize_session=False)
+
+
+def get_blob_store():
+    return ContentAddressedStorage(get_storage_provider())
@@ -0,0 +1,156 @@
+"""
+Small caching layer shared by the app.
+MemoryBackend keeps entries in-process (LRU + TTL). RedisBackend talks to any
+Redis-compatible server so every gunicorn worker sees the same entries and
+the same invalidations. Values must be JSON-serializable.
+
+An invalidation only reaches the process that makes it when entries live in
+memory, so caches whose staleness matters pass local_ttl: with
+MemoryBackend, entries expire within that many seconds whatever their ttl.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    def __init__(self, url, prefix='antigravity:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self, prefix=''):
+        for key in self.client.scan_iter(self.prefix + prefix + '*'):
+            self.client.delete(key)
+
+
+class Cache:
+    """A namespaced view over a backend that counts hits and misses."""
+
+    def __init__(self, namespace, backend, ttl=None, max_ttl=None):
+        self.namespace = namespace
+        self.backend = backend
+        self.max_ttl = max_ttl
+        self.ttl = self._cap(ttl)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _cap(self, ttl):
+        if self.max_ttl is None:
+            return ttl
+        return min(ttl, self.max_ttl) if ttl else self.max_ttl
+
+    def get(self, key):
+        value = self.backend.get(self._key(key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(self._key(key), value, self._cap(ttl) if ttl else self.ttl)
+
+    def delete(self, *keys):
+        self.invalidations += len(keys)
+        self.backend.delete(*(self._key(key) for key in keys))
+
+    def clear(self):
+        """Drop every entry in this namespace."""
+        self.backend.clear(self._key(''))
+
+    def stats(self):
+        """Hit/miss counters for this process."""
+        lookups = self.hits + self.misses
+        return {
+            'namespace': self.namespace,
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'invalidations': self.invalidations,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace, ttl=None, max_entries=1024, local_ttl=None):
+    """Return the process-wide cache for a namespace, creating it on first use.
+
+    Uses Redis when CACHE_BACKEND is 'redis', otherwise an in-process LRU
+    whose entries are kept at most local_ttl seconds (if given).
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            if current_app.config.get('CACHE_BACKEND') == 'redis':
+                backend = RedisBackend(current_app.config['CACHE_REDIS_URL'])
+                cache = Cache(namespace, backend, ttl=ttl)
+            else:
+                backend = MemoryBackend(max_entries=max_entries)
+                cache = Cache(namespace, backend, ttl=ttl, max_ttl=local_ttl)
+            _caches[namespace] = cache
+        return cache
+
+
+def cache_stats():
+    return [cache.stats() for cache in _caches.values()]
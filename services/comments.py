@@ -0,0 +1,73 @@
+"""
+Comment threads for feed cards.
+A card only ships the latest FEED_INLINE_COMMENTS comments of its post; the
+rest are fetched on demand, newest first, through a (created_at, id) keyset
+cursor (the same cursor format as the feed). Authors are joined into the
+comment query so a page of comments costs one SELECT.
+"""
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import joinedload
+from extensions import db
+from models import Comment
+from services.feed import encode_cursor, decode_cursor
+
+
+class CommentPage:
+    def __init__(self, comments, next_cursor):
+        self.comments = comments
+        # Points just before the oldest comment here, None if there are no older ones
+        self.next_cursor = next_cursor
+
+
+def _newest_first():
+    return Comment.created_at.desc(), Comment.id.desc()
+
+
+def latest_comments(post_ids, limit):
+    """Latest `limit` comments of each post, as {post_id: CommentPage}.
+
+    One query for all posts: comments are ranked per post with a window
+    function and the top limit + 1 kept, the extra row telling whether
+    older comments exist. Comments in each page are oldest first.
+    """
+    if not post_ids:
+        return {}
+    rank = func.row_number().over(partition_by=Comment.post_id, order_by=_newest_first())
+    ranked = (db.session.query(Comment.id.label('id'), rank.label('rank'))
+              .filter(Comment.post_id.in_(post_ids))
+              .subquery())
+    rows = (Comment.query
+            .options(joinedload(Comment.author))
+            .join(ranked, Comment.id == ranked.c.id)
+            .filter(ranked.c.rank <= limit + 1)
+            .order_by(*_newest_first())
+            .all())
+
+    by_post = {post_id: [] for post_id in post_ids}
+    for comment in rows:
+        by_post[comment.post_id].append(comment)
+    pages = {}
+    for post_id, comments in by_post.items():
+        shown = comments[:limit]
+        next_cursor = encode_cursor(shown[-1]) if len(comments) > limit else None
+        pages[post_id] = CommentPage(list(reversed(shown)), next_cursor)
+    return pages
+
+
+def load_comment_page(post_id, cursor=None, page_size=20):
+    """One page of a post's comments older than the cursor, newest first.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    query = Comment.query.options(joinedload(Comment.author)).filter(Comment.post_id == post_id)
+    if cursor:
+        created_at, comment_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Comment.created_at < created_at,
+            and_(Comment.created_at == created_at, Comment.id < comment_id),
+        ))
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(*_newest_first()).limit(page_size + 1).all()
+    comments = rows[:page_size]
+    next_cursor = encode_cursor(comments[-1]) if len(rows) > page_size else None
+    return CommentPage(comments, next_cursor)
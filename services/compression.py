@@ -0,0 +1,66 @@
+"""
+Response compression.
+Text responses of at least COMPRESS_MIN_SIZE bytes are compressed with
+brotli when the client accepts it and the optional `brotli` package is
+installed, and with gzip otherwise. Smaller bodies are not worth the CPU.
+Streamed responses (other than static files) are left alone.
+"""
+import gzip
+from flask import current_app, request
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if accepted['br'] and _brotli():
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(response):
+    config = current_app.config
+    if (response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or (response.is_streamed and not response.direct_passthrough)
+            or (response.content_length or 0) < config['COMPRESS_MIN_SIZE']):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    if encoding is None:
+        return response
+
+    # Static files are sent straight from disk; read them in to compress
+    response.direct_passthrough = False
+    data = response.get_data()
+    if encoding == 'br':
+        body = _brotli().compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    else:
+        body = gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+
+    # The bytes differ from the uncompressed ones, so a strong ETag no longer applies
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.after_request(_compress)
@@ -0,0 +1,58 @@
+"""
+SMS credit ledger.
+Every change is an append-only CreditLedger row plus a single conditional
+UPDATE of the materialized User.sms_credits balance, in the caller's
+transaction. Debits never read-modify-write in Python and take no explicit
+row locks: the database applies `sms_credits - :cost` only while the
+balance still covers it, so concurrent sends can neither overdraw nor lose
+updates.
+"""
+from sqlalchemy import func, update
+from extensions import db
+
+
+class InsufficientCredits(Exception):
+    pass
+
+
+def debit(user_id, amount, reason, sms_log=None):
+    """Take credits from a user. Raises InsufficientCredits if the balance is too low."""
+    from models import User, CreditLedger
+
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.sms_credits >= amount)
+        .values(sms_credits=User.sms_credits - amount)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise InsufficientCredits(f"User {user_id} cannot cover {amount} credits")
+
+    db.session.add(CreditLedger(user_id=user_id, delta=-amount, reason=reason, sms_log=sms_log))
+
+
+def credit(user_id, amount, reason):
+    """Add credits to a user."""
+    from models import User, CreditLedger
+
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(sms_credits=func.coalesce(User.sms_credits, 0) + amount)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.add(CreditLedger(user_id=user_id, delta=amount, reason=reason))
+
+
+def current_balance(user_id):
+    """Fresh materialized balance, bypassing any stale instance in the session."""
+    from models import User
+    return db.session.query(User.sms_credits).filter_by(id=user_id).scalar() or 0
+
+
+def ledger_balance(user_id):
+    """Balance recomputed from the ledger (source of truth)."""
+    from models import CreditLedger
+    return (db.session.query(func.coalesce(func.sum(CreditLedger.delta), 0))
+            .filter_by(user_id=user_id)
+            .scalar())
@@ -0,0 +1,36 @@
+"""
+Engine tuning that has to happen per connection.
+SQLite gets its pragmas on every new DBAPI connection. WAL lets readers
+carry on while a like toggle holds the write lock; synchronous=NORMAL is
+durable enough under WAL; busy_timeout makes a second writer wait for
+the lock instead of failing with "database is locked". Pool sizing and the
+Postgres statement timeout are plain engine options (Config).
+"""
+from sqlalchemy import event
+from extensions import db
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT_MS'),
+)
+
+
+def apply_sqlite_pragmas(engine, config):
+    """Set the configured pragmas on each new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = [(name, config[key]) for name, key in SQLITE_PRAGMAS if config.get(key)]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def init_app(app):
+    with app.app_context():
+        for engine in db.engines.values():  # Primary and any replicas
+            apply_sqlite_pragmas(engine, app.config)
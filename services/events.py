@@ -0,0 +1,202 @@
+"""
+Live feed events for the Server-Sent Events stream (/feed/events).
+Routes publish after committing: a notice for each new post and like/comment
+count deltas. Every open stream holds a Subscription, which drops what its
+viewer's tier may not see (paid-only posts for free users) and the viewer's
+own posts and toggles, which their page already shows. Events arriving
+within EVENTS_COALESCE_SECONDS go out together, with count deltas per post
+summed, so a busy post costs one message per second, not one per click.
+
+MemoryBroker delivers within the current process. With EVENTS_BACKEND=redis,
+RedisBroker publishes through Redis pub/sub so every gunicorn worker (and
+host) hears every event, and fans them out to its local subscribers.
+Publishing happens inside write requests, so it gives up after
+EVENTS_REDIS_TIMEOUT seconds rather than stall them on an unreachable Redis.
+"""
+import json
+import queue
+import threading
+import time
+from flask import current_app
+
+RETRY_MS = 5000  # EventSource reconnect delay
+
+
+class Subscription:
+    def __init__(self, tier, user_id, max_pending=256):
+        self.tier = tier
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_pending)
+
+    def offer(self, event):
+        if event['visibility'] != 'all' and self.tier != 'paid':
+            return
+        if event['actor'] == self.user_id:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            pass  # Slow client: counts are approximate and new-post notices repeat
+
+    def next_batch(self, timeout, coalesce):
+        """Events within `coalesce` seconds of the first one, or [] after `timeout`."""
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + coalesce
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+
+def format_batch(batch):
+    """SSE messages for a batch: one 'post' per new post, one summed 'counts'."""
+    messages = []
+    counts = {}
+    for event in batch:
+        if event['type'] == 'post':
+            messages.append(f"event: post\ndata: {json.dumps({'id': event['post_id']})}\n\n")
+        else:
+            delta = counts.setdefault(str(event['post_id']), {'likes': 0, 'comments': 0})
+            delta['likes'] += event['likes']
+            delta['comments'] += event['comments']
+    counts = {post_id: delta for post_id, delta in counts.items() if any(delta.values())}
+    if counts:
+        messages.append(f"event: counts\ndata: {json.dumps(counts)}\n\n")
+    return messages
+
+
+class MemoryBroker:
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+    def subscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+class RedisBroker:
+    def __init__(self, url, logger, timeout, channel='antigravity:events'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        # The listener idles on the channel between events: no read timeout,
+        # but a periodic PING notices a dead connection
+        self.listen_client = redis.Redis.from_url(url, socket_connect_timeout=timeout,
+                                                  health_check_interval=30)
+        self.channel = channel
+        self.logger = logger
+        self.local = MemoryBroker()
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        import redis
+        try:
+            self.client.publish(self.channel, json.dumps(event))
+        except redis.RedisError:
+            # Called after the write committed; live updates are best effort
+            self.logger.exception("Could not publish a feed event")
+
+    def subscribe(self, subscription):
+        self._ensure_listener()
+        self.local.subscribe(subscription)
+
+    def unsubscribe(self, subscription):
+        self.local.unsubscribe(subscription)
+
+    def __len__(self):
+        return len(self.local)
+
+    def _ensure_listener(self):
+        # Started on first use, so it runs in the worker and not in the master
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import redis
+        while True:
+            try:
+                pubsub = self.listen_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.local.publish(json.loads(message['data']))
+            except redis.RedisError:
+                self.logger.exception("Lost the events channel, reconnecting")
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker selected by EVENTS_BACKEND."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = current_app.config
+            if config['EVENTS_BACKEND'] == 'redis':
+                _broker = RedisBroker(config['EVENTS_REDIS_URL'], current_app.logger,
+                                      config['EVENTS_REDIS_TIMEOUT'])
+            else:
+                _broker = MemoryBroker()
+        return _broker
+
+
+def publish_post(post):
+    """Tell connected viewers in the post's tiers that it exists."""
+    get_broker().publish({'type': 'post', 'post_id': post.id, 'visibility': post.visibility,
+                          'actor': post.author_id})
+
+
+def publish_counts(post_id, visibility, actor_id, likes=0, comments=0):
+    """Like/comment count deltas for a post, caused by actor_id."""
+    get_broker().publish({'type': 'counts', 'post_id': post_id, 'visibility': visibility,
+                          'actor': actor_id, 'likes': likes, 'comments': comments})
+
+
+def open_stream(tier, user_id):
+    """Generator of SSE text for one client, or None if this process is at EVENTS_MAX_STREAMS.
+
+    The subscription only exists while the generator runs, and is dropped
+    when the server closes it on disconnect.
+    """
+    config = current_app.config
+    broker = get_broker()
+    if len(broker) >= config['EVENTS_MAX_STREAMS']:
+        return None
+    heartbeat = config['EVENTS_HEARTBEAT_SECONDS']
+    coalesce = config['EVENTS_COALESCE_SECONDS']
+
+    def stream():
+        subscription = Subscription(tier, user_id)
+        broker.subscribe(subscription)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                batch = subscription.next_batch(heartbeat, coalesce)
+                # A comment line keeps proxies from closing an idle connection
+                yield ''.join(format_batch(batch)) or ': keep-alive\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+    return stream()
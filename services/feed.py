@@ -0,0 +1,218 @@
+"""
+Feed pagination helpers.
+Posts are paged with a (created_at, id) keyset cursor so each page costs the
+same regardless of how deep the reader scrolls, and everything a post card
+needs is pre-loaded in a fixed number of queries. Like/comment counts come
+from the denormalized Post columns, and only the latest few comments of each
+post are loaded (see services/comments.py).
+
+All viewers in a visibility tier share the same ordering, so the newest post
+ids of each tier are cached and invalidated on create/delete. With the
+in-process cache backend other workers miss those invalidations, so there a
+window lives at most FEED_CACHE_LOCAL_TTL seconds, and a window naming a
+post that has since been deleted is dropped and the page read from the
+database.
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import and_, exists, or_
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from extensions import db
+from models import User, Post, Like, SavedPost
+from services.cache import get_cache
+from services.replicas import on_replica
+from services.toggles import get_toggle_buffer
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing just after the given post (or any row with created_at/id)."""
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, post_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except Exception as e:
+        raise ValueError(f"Invalid feed cursor: {cursor!r}") from e
+
+
+class FeedPage:
+    def __init__(self, posts, next_cursor, liked_ids, saved_ids, comments):
+        self.posts = posts
+        self.next_cursor = next_cursor
+        # {post_id: CommentPage} with the latest comments of each post
+        self.comments = comments
+        # Per-viewer state, looked up once per page instead of once per post
+        self.liked_ids = liked_ids
+        self.saved_ids = saved_ids
+
+
+def feed_tier(viewer):
+    """Every viewer in a tier sees the same post list (see Post.visible_to)."""
+    return 'paid' if viewer.is_paid_user() else 'free'
+
+
+def _feed_cache():
+    config = current_app.config
+    return get_cache('feed', ttl=config['FEED_CACHE_TTL'], local_ttl=config['FEED_CACHE_LOCAL_TTL'])
+
+
+def _tier_window(viewer):
+    """Newest (created_at, id) keys visible to the viewer's tier, cached per tier."""
+    cache = _feed_cache()
+    key = f"window:{feed_tier(viewer)}"
+    window = cache.get(key)
+    if window is None:
+        limit = current_app.config['FEED_CACHE_WINDOW']
+        rows = (Post.visible_to(viewer)
+                .with_entities(Post.id, Post.created_at)
+                .order_by(Post.created_at.desc(), Post.id.desc())
+                .limit(limit)
+                .all())
+        window = {
+            # A short window holds the whole tier, so any page can be served from it
+            'complete': len(rows) < limit,
+            'entries': [[post_id, created_at.isoformat()] for post_id, created_at in rows],
+        }
+        if not on_replica():  # A lagging replica must not hide new posts from everyone
+            cache.set(key, window)
+    return window
+
+
+def invalidate_feed_cache(visibility):
+    """Drop the cached windows of every tier that can see a post with this visibility."""
+    tiers = ['free', 'paid'] if visibility == 'all' else ['paid']
+    _feed_cache().delete(*(f"window:{tier}" for tier in tiers))
+
+
+def _card_options():
+    """Eager loads for everything a post card renders."""
+    return (joinedload(Post.author),)
+
+
+def _ids_from_window(viewer, position, limit):
+    """Post ids for the page from the cached id window, or None if it doesn't reach."""
+    window = _tier_window(viewer)
+    keys = [(datetime.fromisoformat(ts), post_id) for post_id, ts in window['entries']]
+    start = 0
+    if position is not None:
+        start = next((i for i, k in enumerate(keys) if k < position), len(keys))
+    if start + limit > len(keys) and not window['complete']:
+        return None
+    return [post_id for _, post_id in keys[start:start + limit]]
+
+
+def _drop_window(viewer):
+    # The window names a post deleted since (in another worker): rebuild it next time
+    _feed_cache().delete(f"window:{feed_tier(viewer)}")
+
+
+def _rows_from_window(viewer, position, limit):
+    """Posts for the page from the cached id window, or None if it doesn't reach or is stale."""
+    ids = _ids_from_window(viewer, position, limit)
+    if ids is None:
+        return None
+    by_id = {post.id: post for post in Post.query.options(*_card_options()).filter(Post.id.in_(ids))}
+    if len(by_id) < len(ids):
+        # A short page would end the feed early; read this one from the database
+        _drop_window(viewer)
+        return None
+    return [by_id[post_id] for post_id in ids]
+
+
+def _keyset_query(viewer, position):
+    query = Post.visible_to(viewer)
+    if position is not None:
+        created_at, post_id = position
+        query = query.filter(or_(
+            Post.created_at < created_at,
+            and_(Post.created_at == created_at, Post.id < post_id),
+        ))
+    return query.order_by(Post.created_at.desc(), Post.id.desc())
+
+
+def _rows_from_db(viewer, position, limit):
+    return _keyset_query(viewer, position).options(*_card_options()).limit(limit).all()
+
+
+def load_feed_page(viewer, cursor=None, page_size=20):
+    """Load one page of the viewer's feed, newest first.
+
+    Pages inside the cached per-tier window only fetch the posts themselves;
+    deeper pages fall back to a keyset query.
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    # Fetch one extra row to know whether another page exists
+    rows = _rows_from_window(viewer, position, page_size + 1)
+    if rows is None:
+        rows = _rows_from_db(viewer, position, page_size + 1)
+    posts = rows[:page_size]
+    next_cursor = encode_cursor(posts[-1]) if len(rows) > page_size else None
+
+    from services.comments import latest_comments
+    post_ids = [p.id for p in posts]
+    liked_ids = Like.post_ids_for(viewer, post_ids)
+    saved_ids = SavedPost.post_ids_for(viewer, post_ids)
+    buffer = get_toggle_buffer()
+    if buffer:
+        # Toggles not yet written (write-behind mode)
+        liked_ids = buffer.overlay('like', viewer.id, post_ids, liked_ids)
+        saved_ids = buffer.overlay('save', viewer.id, post_ids, saved_ids)
+    return FeedPage(
+        posts=posts,
+        next_cursor=next_cursor,
+        liked_ids=liked_ids,
+        saved_ids=saved_ids,
+        comments=latest_comments(post_ids, current_app.config['FEED_INLINE_COMMENTS']),
+    )
+
+
+def _stamp_rows(viewer, ids):
+    if not ids:
+        return {}
+    liked = exists().where(Like.post_id == Post.id, Like.user_id == viewer.id)
+    saved = exists().where(SavedPost.post_id == Post.id, SavedPost.user_id == viewer.id)
+    rows = (db.session.query(Post.id, Post.updated_at, User.username, User.role, User.avatar_path,
+                             User.avatar_thumb_path, liked, saved)
+            .join(Post.author)
+            .filter(Post.id.in_(ids))
+            .all())
+    return {row[0]: row for row in rows}
+
+
+def feed_page_stamp(viewer, cursor=None, page_size=20):
+    """Cheap summary of what load_feed_page() would show, for ETags.
+
+    Lists the page's posts with their updated_at (moved by every edit, like
+    and comment), the author columns shown on the card and the viewer's own
+    like/save state, in one query. Raises ValueError if the cursor is
+    malformed.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    ids = _ids_from_window(viewer, position, page_size + 1)
+    by_id = None
+    if ids is not None:
+        by_id = _stamp_rows(viewer, ids)
+        if len(by_id) < len(ids):
+            _drop_window(viewer)
+            by_id = None
+    if by_id is None:
+        ids = [post_id for post_id, in
+               _keyset_query(viewer, position).with_entities(Post.id).limit(page_size + 1)]
+        by_id = _stamp_rows(viewer, ids)
+    if not ids:
+        return []
+
+    stamp = [list(by_id[post_id]) for post_id in ids if post_id in by_id]
+    buffer = get_toggle_buffer()
+    if buffer:
+        stamp.append([[buffer.state(kind, viewer.id, post_id) for kind in ('like', 'save')]
+                      for post_id in ids])
+    return stamp
@@ -0,0 +1,40 @@
+"""
+Rendered HTML fragment cache for feed cards.
+The parts of a post card that look the same to every viewer (author header,
+content, image, comment list) are rendered once per post version and reused.
+Per-viewer parts such as the like/save toggles are rendered around them.
+"""
+from flask import current_app, render_template
+from markupsafe import Markup
+from services.cache import get_cache
+
+FRAGMENT_TEMPLATES = {
+    'header': 'fragments/post_header.html',
+    'comments': 'fragments/post_comments.html',
+}
+
+
+def _fragment_cache():
+    return get_cache('fragments',
+                     ttl=current_app.config['FRAGMENT_CACHE_TTL'],
+                     max_entries=current_app.config['FRAGMENT_CACHE_SIZE'])
+
+
+def post_fragment(post, part, **context):
+    """Return the cached HTML for one viewer-independent part of a post card.
+
+    Extra context (e.g. the comments to list) must itself be determined by
+    the post version, since it is only used when the fragment is rendered.
+    """
+    # Old versions are never looked up again and age out of the LRU
+    key = f"post:{post.id}:{part}:{post.fragment_version}"
+    cache = _fragment_cache()
+    html = cache.get(key)
+    if html is None:
+        html = render_template(FRAGMENT_TEMPLATES[part], post=post, **context)
+        cache.set(key, html)
+    return Markup(html)
+
+
+def init_app(app):
+    app.add_template_global(post_fragment)
@@ -0,0 +1,120 @@
+"""
+HTTP caching.
+Private pages decorated with @conditional(stamp) get a weak ETag built from
+a cheap stamp of what they show (see services.feed.feed_page_stamp), the
+viewer's own columns and the release. A matching If-None-Match is answered
+with 304 Not Modified before the view runs, so nothing is loaded or
+rendered.
+
+Static assets are linked with their content hash (?v=<hash>) and those URLs
+are cached as immutable; uploads are stored under unique keys, so they are
+too.
+"""
+import hashlib
+import json
+import os
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from werkzeug.security import safe_join
+from services.users import user_version
+
+_static_hashes = {}
+
+
+def _file_hash(path):
+    mtime = os.stat(path).st_mtime_ns
+    cached = _static_hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        _static_hashes[path] = cached
+    return cached[1]
+
+
+def static_version(filename):
+    """Content hash of a file in the static folder, or None if there is no such file."""
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    return _file_hash(path)
+
+
+def _release_version(app):
+    """Hash of every template and static asset, so a deploy changes every ETag."""
+    digest = hashlib.sha256()
+    uploads = os.path.join(app.static_folder, 'uploads')
+    for folder in (os.path.join(app.root_path, app.template_folder), app.static_folder):
+        for root, dirs, files in os.walk(folder):
+            if root == uploads:
+                dirs[:] = []
+                continue
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(path.encode())
+                digest.update(_file_hash(path).encode())
+    return digest.hexdigest()[:12]
+
+
+def conditional(stamp):
+    """Serve the view with a weak ETag and answer revalidations with 304.
+
+    stamp(*args, **kwargs) returns a JSON-serializable summary of everything
+    the page shows apart from the viewer, and must be much cheaper than the
+    view. A ValueError from it (e.g. a bad cursor) is left to the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Rendering consumes pending flash messages; a 304 would lose them
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            try:
+                page = stamp(*args, **kwargs)
+            except ValueError:
+                return view(*args, **kwargs)
+
+            raw = json.dumps([current_app.extensions['http_cache'], request.full_path,
+                              user_version(current_user), page], default=str)
+            etag = hashlib.sha256(raw.encode()).hexdigest()[:32]
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Per-user page: browsers revalidate every time, shared caches keep out
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def _version_static_urls(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        filename = values.get('filename', '')
+        version = None if filename.startswith('uploads/') else static_version(filename)
+        if version:
+            values['v'] = version
+
+
+def _cache_static(response):
+    if request.endpoint != 'static' or response.status_code not in (200, 304):
+        return response
+    filename = request.view_args.get('filename', '')
+    version = request.args.get('v')
+    # An old ?v= must not pin the current file under a year-long cache
+    if filename.startswith('uploads/') or (version and version == static_version(filename)):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['STATIC_IMMUTABLE_MAX_AGE']
+        response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.extensions['http_cache'] = _release_version(app)
+    app.url_defaults(_version_static_urls)
+    app.after_request(_cache_static)
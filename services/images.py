@@ -0,0 +1,190 @@
+"""
+Background image processing for uploads.
+The original upload is stored during the request and shown as-is until a
+worker thread has produced the resized variants (metadata stripped, WebP)
+and recorded their paths on the Post or User row.
+Requires Pillow; without it uploads are simply served as uploaded.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from extensions import db
+from services.storage import get_storage_provider
+
+# variant name -> (max width, max height, crop to exact size, model column)
+POST_VARIANTS = {
+    'thumb': (320, 320, False, 'image_thumb_path'),
+    'feed': (1080, 1080, False, 'image_feed_path'),
+}
+AVATAR_VARIANTS = {
+    'avatar': (80, 80, True, 'avatar_thumb_path'),
+}
+
+
+def image_srcset(post):
+    """srcset listing a post's resized variants, so small screens fetch the thumb ('' until ready)."""
+    from services.storage import media_url
+    sources = [(getattr(post, column), width) for width, _, _, column in POST_VARIANTS.values()]
+    return ', '.join(f"{media_url(path)} {width}w" for path, width in sources if path)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Created lazily so forked workers never inherit a parent's threads
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['IMAGE_WORKERS'],
+                thread_name_prefix='image-worker',
+            )
+        return _executor
+
+
+def render_variant(image, max_width, max_height, crop):
+    """Encode one bounded-size WebP rendition of a PIL image."""
+    from PIL import Image, ImageOps
+
+    if crop:
+        resized = ImageOps.fit(image, (max_width, max_height), Image.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail((max_width, max_height), Image.LANCZOS)
+
+    out = io.BytesIO()
+    # Saving without exif=/icc_profile= drops the original metadata
+    resized.save(out, 'WEBP', quality=80, method=4)
+    return out.getvalue()
+
+
+def render_variants(path, sizes):
+    """WebP renditions of an image file: {name: bytes} for {name: (max width, max height, crop)}."""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as original:
+        # Apply the EXIF orientation before the metadata is discarded
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        return {name: render_variant(image, *size) for name, size in sizes.items()}
+
+
+def _run_cpu_bound(fn, *args):
+    # Under gevent workers (monkey-patched threading) the image "threads" are
+    # greenlets, and Pillow would block the whole worker: run it on gevent's
+    # pool of real OS threads instead
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return fn(*args)
+    if not monkey.is_module_patched('threading'):
+        return fn(*args)
+    return get_hub().threadpool.apply(fn, args)
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(64 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _process(app, model, obj_id, spool_path, variants, basename=None):
+    try:
+        with app.app_context():
+            storage = get_storage_provider()
+            # Variants are named after the original's blob key: its content
+            # hash for blob store uploads, so a re-uploaded image reuses
+            # existing variants, and the object's own key for direct uploads
+            basename = basename or _file_digest(spool_path)
+            keys = {name: f"{basename}_{name}.webp" for name in variants}
+            missing = {name: variants[name][:3] for name, key in keys.items() if not storage.exists(key)}
+            rendered = _run_cpu_bound(render_variants, spool_path, missing) if missing else {}
+
+            paths = {}
+            for name, key in keys.items():
+                if name in rendered:
+                    variant = FileStorage(stream=io.BytesIO(rendered[name]), filename=key,
+                                          content_type='image/webp')
+                    storage.save(variant, key)
+                paths[variants[name][3]] = storage.url_for_key(key)
+
+            model.query.filter_by(id=obj_id).update(paths, synchronize_session=False)
+            db.session.commit()
+            if model.__name__ == 'User':
+                # Cached login identity still points at the original avatar
+                from services.users import invalidate_user
+                invalidate_user(obj_id)
+    except Exception:
+        app.logger.exception(f"Image processing failed for {model.__name__} {obj_id}")
+    finally:
+        os.remove(spool_path)
+
+
+def _pillow_available():
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _process_stored(app, model, obj_id, key, variants):
+    # Direct uploads never passed through the app, so fetch the original first
+    with tempfile.NamedTemporaryFile(prefix='upload-', delete=False) as spool:
+        pass
+    try:
+        with app.app_context():
+            get_storage_provider().download_to(key, spool.name)
+    except Exception:
+        app.logger.exception(f"Could not fetch {key} for image processing")
+        os.remove(spool.name)
+        return
+    _process(app, model, obj_id, spool.name, variants, basename=os.path.splitext(key)[0])
+
+
+def _variants_for(obj):
+    from models import Post
+    return POST_VARIANTS if isinstance(obj, Post) else AVATAR_VARIANTS
+
+
+def spool_upload(file_storage):
+    """Copy an upload to a local temp file for later processing.
+
+    Call before handing the upload to storage, which may consume or close
+    the stream. Returns None when Pillow is unavailable.
+    """
+    if not _pillow_available():
+        return None
+
+    # Spooling to local disk keeps queued jobs from pinning upload bytes in memory
+    file_storage.stream.seek(0)
+    with tempfile.NamedTemporaryFile(prefix='upload-', delete=False) as spool:
+        shutil.copyfileobj(file_storage.stream, spool)
+    file_storage.stream.seek(0)
+    return spool.name
+
+
+def schedule_variants(obj, spool_path):
+    """Queue variant generation for a saved Post or User from a spooled upload."""
+    if spool_path is None:
+        return
+    _get_executor().submit(_process, current_app._get_current_object(),
+                           type(obj), obj.id, spool_path, _variants_for(obj))
+
+
+def schedule_stored_variants(obj, key):
+    """Queue variant generation for an original that was uploaded directly to storage."""
+    if not _pillow_available():
+        return
+    _get_executor().submit(_process_stored, current_app._get_current_object(),
+                           type(obj), obj.id, key, _variants_for(obj))
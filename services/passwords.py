@@ -0,0 +1,100 @@
+"""
+Password hashing off the request thread.
+Hashes are computed in a small process pool so a login storm cannot pin a
+web worker's CPU (and, with threaded workers, its GIL). At most
+PASSWORD_HASH_QUEUE_LIMIT hashes may be pending; beyond that HashingBusy is
+raised and the route asks the user to retry, instead of queueing without
+bound. With PASSWORD_HASH_WORKERS = 0 hashing runs inline.
+
+Both limits are for the whole host: each of the WEB_CONCURRENCY gunicorn
+workers gets its share (rounded up, at least one), since every worker owns
+a pool of its own. The pool's
+processes are spawned, so scripts that hash passwords need the usual
+`if __name__ == '__main__':` guard.
+
+PASSWORD_HASH_METHOD uses werkzeug's method syntax ('pbkdf2:sha256:600000',
+'scrypt:32768:8:1'). Stored hashes made with other parameters are upgraded
+on the next successful login (see needs_rehash).
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already queued."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def _share(host_total):
+    """This web worker's part of a per-host limit."""
+    return max(1, -(-host_total // current_app.config['WEB_CONCURRENCY']))
+
+
+def _get_pool():
+    # Created lazily so forked web workers never inherit a parent's pool
+    global _pool, _slots
+    config = current_app.config
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the web worker may already be running threads
+            _pool = ProcessPoolExecutor(max_workers=_share(config['PASSWORD_HASH_WORKERS']),
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _slots = threading.BoundedSemaphore(_share(config['PASSWORD_HASH_QUEUE_LIMIT']))
+        return _pool, _slots
+
+
+def _run(func, *args):
+    if not current_app.config['PASSWORD_HASH_WORKERS']:
+        return func(*args)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)  # A hashing process died; start fresh next time
+        raise
+    finally:
+        slots.release()
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def hash_method():
+    """Configured method with werkzeug's defaults spelled out, as stored in hashes."""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method == 'scrypt':
+        return 'scrypt:32768:8:1'
+    if method.startswith('pbkdf2') and method.count(':') < 2:
+        algorithm = method.partition(':')[2] or 'sha256'
+        return f'pbkdf2:{algorithm}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash, password):
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != hash_method()
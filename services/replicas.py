@@ -0,0 +1,72 @@
+"""
+Read-replica routing.
+When DATABASE_REPLICA_URLS is set, each replica becomes a 'replica<n>' bind.
+Views decorated with @replica_reads send their SELECTs to one of them;
+everything else, and every write, goes to the primary.
+
+Replicas lag. A request that writes marks the user's session so that, for
+REPLICA_STICKY_SECONDS, their reads stay on the primary and they see their
+own new post or like. Shared caches must not be filled from lagging
+replica reads (see on_replica()).
+"""
+import random
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.elements import TextClause
+
+
+def replica_keys(config):
+    return sorted(key for key in config.get('SQLALCHEMY_BINDS') or {} if key.startswith('replica'))
+
+
+def _is_read(clause):
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() in ('SELECT', 'WITH')
+    return bool(getattr(clause, 'is_select', False))
+
+
+class RoutingSession(Session):
+    """Session that sends reads of replica-enabled requests to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if not self._flushing and _is_read(clause):
+                replica = g.get('db_replica')
+                if replica:
+                    return self._db.engines[replica]
+            else:
+                g.db_wrote = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sticky():
+    return session.get('primary_until', 0) > time.time()
+
+
+def replica_reads(view):
+    """Let this (read-only) view read from a replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        keys = replica_keys(current_app.config)
+        if keys and not _sticky():
+            g.db_replica = random.choice(keys)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def on_replica():
+    """True while the current request reads from a replica."""
+    return has_request_context() and bool(g.get('db_replica'))
+
+
+def _stick_after_write(response):
+    if g.get('db_wrote'):
+        session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+
+def init_app(app):
+    if replica_keys(app.config):
+        app.after_request(_stick_after_write)
@@ -0,0 +1,154 @@
+"""
+Full-text search over posts and comments.
+SQLite uses FTS5 shadow tables (trigram tokenizer, which also works for
+Japanese text without word boundaries); Postgres uses GIN indexes over
+to_tsvector(). The backend is picked from SQLALCHEMY_DATABASE_URI.
+Results are whole posts, ranked by their best-matching post or comment text
+and filtered by the same visibility tiers as the feed.
+"""
+from flask import current_app
+from sqlalchemy import DDL, event, text
+from extensions import db
+
+# Comment matches count for less than matches in the post itself
+COMMENT_WEIGHT = 0.5
+
+
+class SQLiteSearchBackend:
+    MIN_TERM_LENGTH = 3  # trigram tokenizer
+
+    ddl_create = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(content, tokenize='trigram')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(content, tokenize='trigram')",
+    ]
+    ddl_drop = [
+        "DROP TABLE IF EXISTS post_fts",
+        "DROP TABLE IF EXISTS comment_fts",
+    ]
+
+    def index_post(self, post_id, content):
+        db.session.execute(text("INSERT INTO post_fts (rowid, content) VALUES (:id, :content)"),
+                           {'id': post_id, 'content': content})
+
+    def index_comment(self, comment_id, content):
+        db.session.execute(text("INSERT INTO comment_fts (rowid, content) VALUES (:id, :content)"),
+                           {'id': comment_id, 'content': content})
+
+    def remove_post(self, post_id):
+        db.session.execute(text("DELETE FROM post_fts WHERE rowid = :id"), {'id': post_id})
+        db.session.execute(text(
+            "DELETE FROM comment_fts WHERE rowid IN (SELECT id FROM comment WHERE post_id = :id)"),
+            {'id': post_id})
+
+    def rebuild(self):
+        for table, source in (('post_fts', 'post'), ('comment_fts', 'comment')):
+            db.session.execute(text(f"DELETE FROM {table}"))
+            db.session.execute(text(f"INSERT INTO {table} (rowid, content) SELECT id, content FROM {source}"))
+
+    def match_expression(self, query):
+        """Quote each term as an FTS5 string so user input can't inject syntax."""
+        terms = [t for t in query.split() if len(t) >= self.MIN_TERM_LENGTH]
+        return ' '.join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    def ranked_post_ids(self, query, paid, limit, offset):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        # bm25() is negative; lower is a better match
+        rows = db.session.execute(text(f"""
+            WITH hits AS (
+                SELECT rowid AS post_id, bm25(post_fts) AS score
+                FROM post_fts WHERE post_fts MATCH :q
+                UNION ALL
+                SELECT comment.post_id, bm25(comment_fts) * {COMMENT_WEIGHT}
+                FROM comment_fts JOIN comment ON comment.id = comment_fts.rowid
+                WHERE comment_fts MATCH :q
+            )
+            SELECT post.id FROM hits JOIN post ON post.id = hits.post_id
+            WHERE :paid OR post.visibility = 'all'
+            GROUP BY post.id
+            ORDER BY MIN(hits.score), post.created_at DESC
+            LIMIT :limit OFFSET :offset
+        """), {'q': expression, 'paid': paid, 'limit': limit, 'offset': offset})
+        return [post_id for (post_id,) in rows]
+
+
+class PostgresSearchBackend:
+    MIN_TERM_LENGTH = 1
+
+    ddl_create = [
+        "CREATE INDEX IF NOT EXISTS ix_post_content_fts ON post USING GIN (to_tsvector('simple', content))",
+        "CREATE INDEX IF NOT EXISTS ix_comment_content_fts ON comment USING GIN (to_tsvector('simple', content))",
+    ]
+    ddl_drop = []  # Indexes go away with their tables
+
+    # The GIN indexes are maintained by Postgres itself
+    def index_post(self, post_id, content):
+        pass
+
+    def index_comment(self, comment_id, content):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def rebuild(self):
+        db.session.execute(text("REINDEX INDEX ix_post_content_fts"))
+        db.session.execute(text("REINDEX INDEX ix_comment_content_fts"))
+
+    def ranked_post_ids(self, query, paid, limit, offset):
+        if not query.strip():
+            return []
+        rows = db.session.execute(text(f"""
+            WITH q AS (SELECT plainto_tsquery('simple', :q) AS query),
+            hits AS (
+                SELECT post.id AS post_id, ts_rank(to_tsvector('simple', post.content), q.query) AS score
+                FROM post, q WHERE to_tsvector('simple', post.content) @@ q.query
+                UNION ALL
+                SELECT comment.post_id, ts_rank(to_tsvector('simple', comment.content), q.query) * {COMMENT_WEIGHT}
+                FROM comment, q WHERE to_tsvector('simple', comment.content) @@ q.query
+            )
+            SELECT post.id FROM hits JOIN post ON post.id = hits.post_id
+            WHERE :paid OR post.visibility = 'all'
+            GROUP BY post.id
+            ORDER BY MAX(hits.score) DESC, post.created_at DESC
+            LIMIT :limit OFFSET :offset
+        """), {'q': query, 'paid': paid, 'limit': limit, 'offset': offset})
+        return [post_id for (post_id,) in rows]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def backend_for_uri(uri):
+    return BACKENDS[uri.split(':', 1)[0].split('+', 1)[0]]()
+
+
+def get_search_backend():
+    return backend_for_uri(current_app.config['SQLALCHEMY_DATABASE_URI'])
+
+
+def search_posts(viewer, query, page=1, per_page=20):
+    """One page of posts matching query that the viewer may see.
+
+    Returns (posts, has_next).
+    """
+    from models import Post
+    from services.feed import _card_options
+
+    ids = get_search_backend().ranked_post_ids(
+        query, paid=viewer.is_paid_user(), limit=per_page + 1, offset=(page - 1) * per_page)
+    by_id = {p.id: p for p in Post.query.options(*_card_options()).filter(Post.id.in_(ids[:per_page]))}
+    return [by_id[i] for i in ids[:per_page] if i in by_id], len(ids) > per_page
+
+
+def attach_search_ddl(metadata):
+    """Create/drop the search structures along with the tables (create_all/drop_all)."""
+    for dialect, backend in BACKENDS.items():
+        for statement in backend.ddl_create:
+            event.listen(metadata, 'after_create', DDL(statement).execute_if(dialect=dialect))
+        for statement in backend.ddl_drop:
+            event.listen(metadata, 'before_drop', DDL(statement).execute_if(dialect=dialect))
@@ -0,0 +1,208 @@
+"""
+SMS broadcast engine.
+A broadcast is persisted as an SMSLog job and sent from a background thread:
+recipients are read in keyset-ordered chunks (never the whole table), each
+chunk is fanned out to a bounded pool of rate-limited provider calls, and
+progress/retry counters are committed after every chunk so the admin
+dashboard can follow along and a stalled job can resume from last_user_id.
+
+A sender first claims its job with a conditional UPDATE, so two runners
+never send the same job. A job whose process died (restart, deploy,
+max_requests) is picked up again by `flask resume-sms-broadcasts`: queued
+jobs, and 'sending' jobs without a heartbeat for SMS_STALE_AFTER seconds,
+continue after last_user_id. Delivery is at-least-once: the chunk that was
+in flight when a sender died is sent again.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, func, or_, update
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class SMSSendError(Exception):
+    """A provider could not deliver a message. Retried by the dispatcher."""
+
+
+class SMSProvider:
+    """Interface for SMS gateways (Twilio, SNS, ...)."""
+
+    def send(self, phone_number, message):
+        raise NotImplementedError
+
+
+class ConsoleSMSProvider(SMSProvider):
+    """Local fake: logs instead of sending, with optional latency and failures."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def send(self, phone_number, message):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise SMSSendError(f"Simulated failure for {phone_number}")
+        logger.info("[MOCK SMS] %s: %s", phone_number, message)
+
+
+PROVIDERS = {
+    'console': ConsoleSMSProvider,
+}
+
+
+def get_sms_provider():
+    return PROVIDERS[current_app.config['SMS_PROVIDER']]()
+
+
+class RateLimiter:
+    """Token bucket shared by all sender threads."""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+
+def _get_job_executor():
+    # Created lazily so forked workers never inherit a parent's threads
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='sms-job')
+        return _job_executor
+
+
+def _send_with_retries(provider, limiter, phone_number, message, max_retries):
+    """Returns (delivered, retries used)."""
+    if not phone_number:
+        return False, 0
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            provider.send(phone_number, message)
+            return True, attempt
+        except SMSSendError:
+            if attempt < max_retries:
+                time.sleep(min(2 ** attempt * 0.1, 2.0))
+    return False, max_retries
+
+
+def _advance(log_id, **values):
+    from models import SMSLog
+    SMSLog.query.filter_by(id=log_id).update(
+        dict(values, heartbeat_at=datetime.utcnow()), synchronize_session=False)
+    db.session.commit()
+
+
+def _resumable():
+    """Condition matching queued jobs and 'sending' jobs whose sender went silent."""
+    from models import SMSLog
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['SMS_STALE_AFTER'])
+    return or_(SMSLog.status == 'queued',
+               and_(SMSLog.status == 'sending',
+                    func.coalesce(SMSLog.heartbeat_at, SMSLog.timestamp) < stale_before))
+
+
+def _claim(log_id, resume):
+    """Atomically move a job to 'sending'; True if this runner now owns it."""
+    from models import SMSLog
+    claimable = _resumable() if resume else SMSLog.status == 'queued'
+    result = db.session.execute(
+        update(SMSLog)
+        .where(SMSLog.id == log_id, claimable)
+        .values(status='sending', heartbeat_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def run_broadcast(log_id, resume=False):
+    """Send one broadcast job to completion. Needs an app context.
+
+    Returns False without sending if another runner holds the job (or it
+    has finished). With resume=True a stale 'sending' job is taken over.
+    """
+    from models import SMSLog, User
+
+    if not _claim(log_id, resume):
+        return False
+
+    config = current_app.config
+    log = db.session.get(SMSLog, log_id)
+    message, last_user_id = log.content, log.last_user_id
+    provider = get_sms_provider()
+    limiter = RateLimiter(config['SMS_RATE_PER_SECOND'])
+
+    try:
+        with ThreadPoolExecutor(max_workers=config['SMS_CONCURRENCY'],
+                                thread_name_prefix='sms-send') as senders:
+            while True:
+                chunk = (db.session.query(User.id, User.phone_number)
+                         .filter(User.sms_opt_in == True, User.id > last_user_id)  # noqa: E712
+                         .order_by(User.id)
+                         .limit(config['SMS_CHUNK_SIZE'])
+                         .all())
+                # Release the read transaction while the chunk is being sent
+                db.session.commit()
+                if not chunk:
+                    break
+
+                results = list(senders.map(
+                    lambda row: _send_with_retries(provider, limiter, row.phone_number,
+                                                   message, config['SMS_MAX_RETRIES']),
+                    chunk))
+                sent = sum(1 for delivered, _ in results if delivered)
+                last_user_id = chunk[-1].id
+                _advance(log_id,
+                         sent_count=SMSLog.sent_count + sent,
+                         failed_count=SMSLog.failed_count + (len(chunk) - sent),
+                         retry_count=SMSLog.retry_count + sum(r for _, r in results),
+                         last_user_id=last_user_id)
+
+        _advance(log_id, status='completed', finished_at=datetime.utcnow())
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception(f"SMS broadcast {log_id} failed")
+        _advance(log_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+    return True
+
+
+def resume_broadcasts():
+    """Run queued and stale jobs in this process; returns the ids it sent."""
+    from models import SMSLog
+    candidates = [log_id for log_id, in (db.session.query(SMSLog.id)
+                                         .filter(_resumable())
+                                         .order_by(SMSLog.id))]
+    db.session.commit()
+    return [log_id for log_id in candidates if run_broadcast(log_id, resume=True)]
+
+
+def _run_in_app(app, log_id):
+    with app.app_context():
+        run_broadcast(log_id)
+
+
+def start_broadcast(log_id):
+    """Queue a persisted SMSLog job for background sending."""
+    _get_job_executor().submit(_run_in_app, current_app._get_current_object(), log_id)
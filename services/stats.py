@@ -0,0 +1,41 @@
+"""
+Cached member aggregates (users per role, SMS opt-ins).
+Computed with one GROUP BY query, kept for MEMBER_STATS_TTL seconds and
+dropped early by the routes that change a role or opt-in.
+"""
+from flask import current_app
+from sqlalchemy import func
+from extensions import db
+from services.cache import get_cache
+from services.replicas import on_replica
+
+ROLES = ('owner', 'admin', 'paid', 'free')
+
+
+def _stats_cache():
+    return get_cache('stats', ttl=current_app.config['MEMBER_STATS_TTL'])
+
+
+def member_stats():
+    """{'total', 'opted_in', 'by_role': {role: count}} for all members."""
+    cache = _stats_cache()
+    stats = cache.get('members')
+    if stats is None:
+        from models import User
+        rows = (db.session.query(User.role, User.sms_opt_in, func.count(User.id))
+                .group_by(User.role, User.sms_opt_in)
+                .all())
+        by_role = dict.fromkeys(ROLES, 0)
+        opted_in = 0
+        for role, sms_opt_in, count in rows:
+            by_role[role] = by_role.get(role, 0) + count
+            if sms_opt_in:
+                opted_in += count
+        stats = {'total': sum(by_role.values()), 'opted_in': opted_in, 'by_role': by_role}
+        if not on_replica():
+            cache.set('members', stats)
+    return stats
+
+
+def invalidate_member_stats():
+    _stats_cache().delete('members')
@@ -1,7 +1,12 @@
 import os
+import shutil
+import threading
 from werkzeug.utils import secure_filename
 from flask import current_app, url_for
 
+# Keys are never reused (content hashes or random tokens), so objects never change
+UPLOAD_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
 class LocalStorage:
     def save(self, file_storage, filename):
         """Save file to local static/uploads directory."""
@@ -11,22 +16,149 @@ class LocalStorage:
         filepath = os.path.join(upload_folder, filename)
         file_storage.save(filepath)
         
-        # Return the URL for the file
-        return url_for('static', filename=f'uploads/{filename}')
+        return self.url_for_key(filename)
+
+    def _path(self, key):
+        return os.path.join(current_app.root_path, 'static', 'uploads', key)
+
+    def url_for_key(self, key):
+        # Built without url_for so it also works from background workers
+        # that have no request context
+        return f"{current_app.static_url_path}/uploads/{key}"
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def size(self, key):
+        """Size in bytes of a stored object, or None if there is none."""
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def download_to(self, key, path):
+        shutil.copyfile(self._path(key), path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def save_stream(self, stream, key, max_bytes, content_type):
+        """Write a raw request body to the upload folder (signed local uploads).
+
+        Returns False if the body exceeds max_bytes. Raises ValueError, and
+        keeps nothing, unless its first bytes are an image of content_type.
+        """
+        from services.uploads import sniff_image_type
+        head = stream.read(64 * 1024)
+        if sniff_image_type(head[:16]) != content_type:
+            raise ValueError(f"Upload is not {content_type}")
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = 0
+        with open(path, 'wb') as out:
+            chunk = head
+            while chunk:
+                written += len(chunk)
+                if written > max_bytes:
+                    break
+                out.write(chunk)
+                chunk = stream.read(64 * 1024)
+        if written > max_bytes:
+            os.remove(path)
+            return False
+        return True
+
+    def presign_upload(self, key, content_type, max_bytes, expires_in):
+        """Signed-URL parameters for uploading straight to this provider."""
+        from services.uploads import local_upload_url
+        return {
+            'method': 'PUT',
+            'url': local_upload_url(key, content_type, max_bytes, expires_in),
+            'fields': {},
+        }
 
 class S3Storage:
-    def __init__(self):
+    """S3 (or S3-compatible) storage.
+
+    Build it once per process: the boto3 client holds the resolved
+    credentials and a pooled set of keep-alive connections. Settings come
+    from the app config (AWS_* and S3_* in config.Config).
+    """
+    def __init__(self, config):
         import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config as BotoConfig
+
+        mb = 1024 * 1024
+        self.endpoint_url = config['S3_ENDPOINT_URL']  # e.g. a local MinIO/moto server
+        self.region = config['AWS_REGION']
         self.s3 = boto3.client(
             's3',
-            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.environ.get('AWS_REGION', 'ap-northeast-1')
+            aws_access_key_id=config['AWS_ACCESS_KEY_ID'],
+            aws_secret_access_key=config['AWS_SECRET_ACCESS_KEY'],
+            region_name=self.region,
+            endpoint_url=self.endpoint_url,
+            config=BotoConfig(
+                max_pool_connections=config['S3_MAX_POOL_CONNECTIONS'],
+                retries={'max_attempts': 3, 'mode': 'standard'},
+                # Local stand-ins generally don't support virtual-host style buckets
+                s3={'addressing_style': 'path' if self.endpoint_url else 'auto'},
+            ),
+        )
+        # Files above the threshold are streamed as concurrent multipart parts
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config['S3_MULTIPART_THRESHOLD_MB'] * mb,
+            multipart_chunksize=config['S3_MULTIPART_CHUNKSIZE_MB'] * mb,
+            max_concurrency=config['S3_MAX_CONCURRENCY'],
         )
-        self.bucket_name = os.environ.get('S3_BUCKET_NAME')
+        self.bucket_name = config['S3_BUCKET_NAME']
+
+    def url_for_key(self, key):
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket_name}/{key}"
+        # Assuming standard S3 URL structure (or CloudFront)
+        return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{key}"
+
+    def exists(self, key):
+        return self.size(key) is not None
+
+    def size(self, key):
+        """Size in bytes of a stored object, or None if there is none."""
+        from botocore.exceptions import ClientError
+        try:
+            return self.s3.head_object(Bucket=self.bucket_name, Key=key)['ContentLength']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def download_to(self, key, path):
+        self.s3.download_file(self.bucket_name, key, path, Config=self.transfer_config)
+
+    def delete(self, key):
+        self.s3.delete_object(Bucket=self.bucket_name, Key=key)
+
+    def presign_upload(self, key, content_type, max_bytes, expires_in):
+        """Presigned POST letting the browser upload straight to the bucket."""
+        post = self.s3.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=key,
+            Fields={'Content-Type': content_type, 'Cache-Control': UPLOAD_CACHE_CONTROL},
+            Conditions=[
+                {'Content-Type': content_type},
+                {'Cache-Control': UPLOAD_CACHE_CONTROL},
+                ['content-length-range', 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
 
     def save(self, file_storage, filename):
-        """Upload file to AWS S3 bucket."""
+        """Stream file to the S3 bucket, using multipart upload for large files."""
         if not self.bucket_name:
             raise ValueError("S3_BUCKET_NAME is not set")
 
@@ -37,18 +169,38 @@ class S3Storage:
                 filename,
                 ExtraArgs={
                     "ContentType": file_storage.content_type,
+                    "CacheControl": UPLOAD_CACHE_CONTROL,
                     # "ACL": "public-read" # Uncomment if bucket is public, or using CloudFront
-                }
+                },
+                Config=self.transfer_config,
             )
-            # Assuming standard S3 URL structure (or CloudFront)
-            region = os.environ.get('AWS_REGION', 'ap-northeast-1')
-            return f"https://{self.bucket_name}.s3.{region}.amazonaws.com/{filename}"
+            return self.url_for_key(filename)
         except Exception as e:
             current_app.logger.error(f"S3 Upload Error: {e}")
             raise e
 
+def media_url(path):
+    """URL for a stored image path.
+
+    Providers return absolute URLs; bare filenames live under static/uploads.
+    """
+    if not path:
+        return None
+    if path.startswith(('http://', 'https://', '/')):
+        return path
+    return url_for('static', filename=f'uploads/{path}')
+
+_provider = None
+_provider_lock = threading.Lock()
+
 def get_storage_provider():
-    """Return S3Storage if configured, otherwise LocalStorage."""
-    if os.environ.get('USE_S3', 'False').lower() == 'true':
-        return S3Storage()
-    return LocalStorage()
+    """Return the process-wide S3Storage if configured, otherwise LocalStorage."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if str(current_app.config['USE_S3']).lower() == 'true':
+                    _provider = S3Storage(current_app.config)
+                else:
+                    _provider = LocalStorage()
+    return _provider
@@ -0,0 +1,187 @@
+"""
+Write-behind buffer for like/save toggles (LIKE_WRITE_BEHIND=1).
+Instead of a write transaction per click, a toggle is recorded in memory and
+answered at once: one indexed read tells the stored state, the buffer says
+what the user changed since. A second toggle of the same pair cancels the
+first, so click bursts write nothing. Every LIKE_FLUSH_INTERVAL seconds (or
+sooner past LIKE_FLUSH_MAX_PENDING pairs) a background thread writes the
+batch in one transaction: bulk INSERT of new rows, one DELETE for removed
+ones and one like_count UPDATE per post.
+
+The buffer is per process. Like counts in responses are the stored count
+plus this process's unflushed changes, so they are approximate; each user's
+own state is exact as long as their requests reach the same process within
+a flush interval. Anything still buffered is written at interpreter exit.
+
+A toggle reads the stored state before taking the buffer's lock, so a flush
+may commit the same pair in between. Pairs written by recent flushes are
+therefore remembered for a few seconds and take precedence over the read.
+"""
+import atexit
+import threading
+import time
+from collections import Counter
+from flask import current_app
+from sqlalchemy import delete, exists, insert, tuple_
+from extensions import db
+
+
+def _models():
+    from models import Like, SavedPost
+    return {'like': Like, 'save': SavedPost}
+
+
+class ToggleBuffer:
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config['LIKE_FLUSH_INTERVAL']
+        self.max_pending = app.config['LIKE_FLUSH_MAX_PENDING']
+        # (kind, user_id, post_id) -> state to write; each entry differs from the stored row
+        self._pending = {}
+        self._in_flight = {}  # The batch being written right now
+        # (kind, user_id, post_id) -> (monotonic time, state) committed by recent flushes
+        self._written = {}
+        self._written_ttl = max(2 * self.interval, 5.0)
+        self._like_deltas = Counter()  # post_id -> unflushed like_count change
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        threading.Thread(target=self._run, name='toggle-flusher', daemon=True).start()
+        atexit.register(self.flush)
+
+    def state(self, kind, user_id, post_id):
+        """Buffered state of a pair, or None if the stored row is current."""
+        key = (kind, user_id, post_id)
+        with self._lock:
+            return self._pending.get(key, self._in_flight.get(key))
+
+    def toggle(self, kind, user_id, post_id, stored):
+        """Flip the pair given its stored state; returns the new state."""
+        key = (kind, user_id, post_id)
+        with self._lock:
+            if key in self._pending:
+                # Toggled back before it was written: nothing left to do
+                active = not self._pending.pop(key)
+            else:
+                written = self._written.get(key)
+                if written and time.monotonic() - written[0] < self._written_ttl:
+                    # Committed by a flush after `stored` may have been read
+                    stored = written[1]
+                active = not self._in_flight.get(key, stored)
+                self._pending[key] = active
+            if kind == 'like':
+                self._like_deltas[post_id] += 1 if active else -1
+            if len(self._pending) >= self.max_pending:
+                self._wake.set()
+        return active
+
+    def like_delta(self, post_id):
+        with self._lock:
+            return self._like_deltas[post_id]
+
+    def overlay(self, kind, user_id, post_ids, stored_ids):
+        """stored_ids (a set of post ids) with this user's buffered toggles applied."""
+        ids = set(stored_ids)
+        for post_id in post_ids:
+            state = self.state(kind, user_id, post_id)
+            if state is not None:
+                (ids.add if state else ids.discard)(post_id)
+        return ids
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+            try:
+                with self.app.app_context():
+                    _write(batch)
+            except Exception:
+                self.app.logger.exception(f"Could not write {len(batch)} buffered toggles, retrying")
+                with self._lock:
+                    for key, state in batch.items():
+                        # A newer toggle of the same pair undoes this one
+                        if self._pending.pop(key, None) is None:
+                            self._pending[key] = state
+                    self._in_flight = {}
+                return
+            with self._lock:
+                now = time.monotonic()
+                self._written = {key: entry for key, entry in self._written.items()
+                                 if now - entry[0] < self._written_ttl}
+                self._written.update((key, (now, state)) for key, state in batch.items())
+                self._in_flight = {}
+                for (kind, _, post_id), state in batch.items():
+                    if kind == 'like':
+                        self._like_deltas[post_id] -= 1 if state else -1
+                        if not self._like_deltas[post_id]:
+                            del self._like_deltas[post_id]
+
+
+def _write(batch):
+    from models import Post
+    post_ids = {post_id for _, _, post_id in batch}
+    live = {post_id for post_id, in db.session.query(Post.id).filter(Post.id.in_(post_ids))}
+    like_deltas = Counter()
+    for kind, model in _models().items():
+        wanted = {(user_id, post_id): state for (k, user_id, post_id), state in batch.items()
+                  if k == kind and post_id in live}
+        if not wanted:
+            continue
+        pair = tuple_(model.user_id, model.post_id)
+        # Requests reaching other processes may have written some pairs already
+        existing = set(db.session.query(model.user_id, model.post_id).filter(pair.in_(list(wanted))))
+        added = [key for key, state in wanted.items() if state and key not in existing]
+        removed = [key for key, state in wanted.items() if not state and key in existing]
+        if added:
+            db.session.execute(insert(model), [{'user_id': u, 'post_id': p} for u, p in added])
+        if removed:
+            db.session.execute(delete(model).where(pair.in_(removed)))
+        if kind == 'like':
+            like_deltas.update(post_id for _, post_id in added)
+            like_deltas.subtract(post_id for _, post_id in removed)
+    for post_id, delta in like_deltas.items():
+        if delta:
+            Post.adjust_counters(post_id, like_count=delta)
+    db.session.commit()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_toggle_buffer():
+    """The process-wide buffer, or None when LIKE_WRITE_BEHIND is off."""
+    global _buffer
+    if not current_app.config['LIKE_WRITE_BEHIND']:
+        return None
+    # Created lazily so forked workers never inherit a parent's flusher thread
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ToggleBuffer(current_app._get_current_object())
+        return _buffer
+
+
+def buffered_toggle(kind, user_id, post_id):
+    """Toggle through the buffer: (active, approximate like_count, visibility), or None if no post."""
+    from models import Post
+    model = _models()[kind]
+    row = (db.session.query(Post.like_count, Post.visibility,
+                            exists().where(model.post_id == Post.id, model.user_id == user_id))
+           .filter(Post.id == post_id)
+           .first())
+    if row is None:
+        return None
+    like_count, visibility, stored = row
+    buffer = get_toggle_buffer()
+    active = buffer.toggle(kind, user_id, post_id, stored)
+    return active, like_count + buffer.like_delta(post_id), visibility
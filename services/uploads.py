@@ -0,0 +1,130 @@
+"""
+Direct-to-storage uploads.
+The browser asks for a signed upload target, sends the image straight to S3
+(or to the signed local endpoint when using LocalStorage), then submits the
+form with the returned upload token. Only the small token passes through the
+request that creates the Post or User.
+
+Only the image types in IMAGE_TYPES are accepted, and the key's extension
+comes from that table, never from the client's filename. Signing a post
+upload needs a login; an avatar needs a login or the signed nonce embedded
+in the registration form, and anonymous uploads are capped per nonce and per
+client address. Every signed key is recorded as a PendingUpload until it is
+confirmed, so `flask gc-blobs` can delete the ones never attached. A
+confirmed key becomes a Blob with one reference, released like any other
+when its Post/User lets go of it.
+"""
+import secrets
+from datetime import datetime
+from flask import current_app, url_for
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from extensions import db
+from models import PendingUpload
+from services.blobstore import get_blob_store
+from services.storage import get_storage_provider
+
+UPLOAD_KINDS = ('post', 'avatar')
+
+# Accepted content types and the extension their keys get (it picks the served Content-Type)
+IMAGE_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+}
+
+
+def _serializer(salt):
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=salt)
+
+
+def sniff_image_type(head):
+    """Content type of an accepted image from its first bytes, or None."""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def registration_nonce():
+    """Signed nonce for the registration form, allowing a few anonymous avatar uploads."""
+    return _serializer('upload-register').dumps(secrets.token_hex(16))
+
+
+def check_registration_nonce(token):
+    """The nonce inside a registration token, or None if it is invalid or expired."""
+    try:
+        return _serializer('upload-register').loads(
+            token, max_age=current_app.config['UPLOAD_NONCE_MAX_AGE'])
+    except BadSignature:
+        return None
+
+
+def anonymous_upload_allowed(nonce, remote_addr):
+    """Whether another unconfirmed anonymous upload fits the per-nonce and per-address caps."""
+    config = current_app.config
+    pending = PendingUpload.query.filter(PendingUpload.user_id.is_(None))
+    if pending.filter_by(nonce=nonce).count() >= config['UPLOAD_ANON_PER_NONCE']:
+        return False
+    return pending.filter_by(remote_addr=remote_addr).count() < config['UPLOAD_ANON_PER_ADDR']
+
+
+def issue_upload(kind, content_type, user_id, nonce=None, remote_addr=None):
+    """Signed upload target plus the token that later confirms it.
+
+    content_type must be one of IMAGE_TYPES.
+    """
+    key = secrets.token_hex(8) + IMAGE_TYPES[content_type]
+    db.session.add(PendingUpload(key=key, kind=kind, user_id=user_id, nonce=nonce,
+                                 remote_addr=remote_addr, created_at=datetime.utcnow()))
+    db.session.commit()
+
+    target = get_storage_provider().presign_upload(
+        key, content_type,
+        current_app.config['UPLOAD_MAX_BYTES'],
+        current_app.config['UPLOAD_URL_EXPIRY'],
+    )
+    target['key'] = key
+    target['upload_token'] = _serializer('upload-confirm').dumps(
+        {'key': key, 'kind': kind, 'uid': user_id})
+    return target
+
+
+def local_upload_url(key, content_type, max_bytes, expires_in):
+    token = _serializer('upload-local').dumps(
+        {'key': key, 'type': content_type, 'max': max_bytes, 'ttl': expires_in})
+    return url_for('uploads.local_upload', token=token)
+
+
+def load_local_upload(token):
+    """Decode a signed local upload URL token. Raises BadSignature if invalid."""
+    serializer = _serializer('upload-local')
+    data = serializer.loads(token)
+    # Re-check with the expiry embedded at signing time
+    return serializer.loads(token, max_age=data['ttl'])
+
+
+def confirm_upload(token, kind, user_id):
+    """Return the storage key of a finished direct upload, or None if invalid."""
+    try:
+        data = _serializer('upload-confirm').loads(
+            token, max_age=current_app.config['UPLOAD_CONFIRM_MAX_AGE'])
+    except BadSignature:
+        return None
+
+    if data['kind'] != kind or data['uid'] != user_id:
+        return None
+    # Each token attaches once; the row is gone after use or garbage collection
+    pending = db.session.get(PendingUpload, data['key'])
+    size = get_storage_provider().size(data['key']) if pending else None
+    if size is None:
+        return None
+    # Both happen in the caller's transaction, together with creating the Post/User
+    db.session.delete(pending)
+    get_blob_store().add_reference(data['key'], size)
+    return data['key']
@@ -0,0 +1,84 @@
+"""
+Identity cache for the Flask-Login user loader.
+The loader runs on every authenticated request; instead of a SELECT each
+time, the user's column values are kept for USER_CACHE_TTL seconds and
+turned back into a session-attached User without touching the database.
+Routes that change a user call invalidate_user() after committing. That
+reaches every worker only with CACHE_BACKEND=redis; with the in-process
+backend an entry lives at most USER_CACHE_LOCAL_TTL seconds, so a demoted
+admin loses their role in other workers within that time.
+Credentials (password hash, reset token) are never cached; reading them
+loads them from the database on demand.
+"""
+import hashlib
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import DateTime, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from extensions import db
+from services.cache import get_cache
+from services.replicas import on_replica
+
+UNCACHED_COLUMNS = {'password_hash', 'reset_token', 'reset_token_expiry'}
+
+
+def _user_cache():
+    config = current_app.config
+    return get_cache('users', ttl=config['USER_CACHE_TTL'], max_entries=config['USER_CACHE_SIZE'],
+                     local_ttl=config['USER_CACHE_LOCAL_TTL'])
+
+
+def _cached_columns():
+    from models import User
+    return [c for c in inspect(User).columns if c.key not in UNCACHED_COLUMNS]
+
+
+def _to_entry(user):
+    entry = {}
+    for column in _cached_columns():
+        value = getattr(user, column.key)
+        entry[column.key] = value.isoformat() if isinstance(value, datetime) else value
+    return entry
+
+
+def _from_entry(entry):
+    from models import User
+    user = User()
+    for column in _cached_columns():
+        value = entry.get(column.key)
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        setattr(user, column.key, value)
+    # Treat it as a clean row loaded from the database, then attach it
+    # without the SELECT that merge() would otherwise issue
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def load_user(user_id):
+    """User for the session's user id, from the cache when possible."""
+    from models import User
+
+    cache = _user_cache()
+    key = str(user_id)
+    entry = cache.get(key)
+    if entry is not None:
+        return _from_entry(entry)
+
+    user = db.session.get(User, int(user_id))
+    if user is not None and not on_replica():
+        cache.set(key, _to_entry(user))
+    return user
+
+
+def invalidate_user(user_id):
+    _user_cache().delete(str(user_id))
+
+
+def user_version(user):
+    """Short hash of the user's cached columns; changes whenever one of them does."""
+    if not user.is_authenticated:
+        return None
+    raw = json.dumps(_to_entry(user), sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
@@ -1,5 +1,160 @@
 // Main JS for Antigravity
 
+function toggleComments(postId) {
+    const section = document.getElementById(`comments-${postId}`);
+    if (section) section.style.display = section.style.display === 'none' ? 'block' : 'none';
+}
+
+function el(tag, style = '', ...children) {
+    const node = document.createElement(tag);
+    if (style) node.style.cssText = style;
+    node.append(...children);
+    return node;
+}
+
+function renderComment(comment) {
+    const row = el('div', 'margin-bottom: 10px; font-size: 0.9rem; border-bottom: 1px solid var(--border-color); padding-bottom: 5px;',
+        el('strong', 'color: var(--accent);', comment.author), `: ${comment.content}`);
+    row.className = 'comment';
+    return row;
+}
+
+// Feed cards built from /feed.json payloads; mirrors the markup of templates/feed.html
+const ICONS = {
+    like: '<path d="M20.84 4.61a5.5 5.5 0 0 0-7.78 0L12 5.67l-1.06-1.06a5.5 5.5 0 0 0-7.78 7.78l1.06 1.06L12 21.23l7.78-7.78 1.06-1.06a5.5 5.5 0 0 0 0-7.78z"></path>',
+    comment: '<path d="M21 11.5a8.38 8.38 0 0 1-.9 3.8 8.5 8.5 0 0 1-7.6 4.7 8.38 8.38 0 0 1-3.8-.9L3 21l1.9-5.7a8.38 8.38 0 0 1-.9-3.8 8.5 8.5 0 0 1 4.7-7.6 8.38 8.38 0 0 1 3.8-.9h.5a8.48 8.48 0 0 1 8 8v.5z"></path>',
+    save: '<path d="M19 21l-7-5-7 5V5a2 2 0 0 1 2-2h10a2 2 0 0 1 2 2z"></path>',
+    delete: '<polyline points="3 6 5 6 21 6"></polyline><path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"></path>',
+};
+
+const ROLE_BADGES = {
+    owner: ['オーナー', 'background: var(--accent); color: white;'],
+    admin: ['管理者', 'background: #e74c3c; color: white;'],
+    paid: ['PRO', 'background: #f1c40f; color: black;'],
+};
+
+function icon(name, filled = false, size = 24) {
+    return `<svg xmlns="http://www.w3.org/2000/svg" width="${size}" height="${size}" viewBox="0 0 24 24" `
+        + `fill="${filled ? 'currentColor' : 'none'}" stroke="currentColor" stroke-width="2" `
+        + `stroke-linecap="round" stroke-linejoin="round">${ICONS[name]}</svg>`;
+}
+
+function renderPost(post) {
+    const card = el('div', 'padding: 24px; margin-bottom: 24px; animation: fadeIn 0.5s ease;');
+    card.id = `post-${post.id}`;
+    card.className = 'glass-panel';
+
+    // Header
+    const avatar = el('div', 'width: 40px; height: 40px; border-radius: 50%; overflow: hidden; background: linear-gradient(135deg, var(--accent), var(--accent-dark)); flex-shrink: 0;');
+    if (post.author.avatar_url) {
+        const img = el('img', 'width: 100%; height: 100%; object-fit: cover;');
+        img.src = post.author.avatar_url;
+        img.alt = post.author.username;
+        avatar.append(img);
+    } else {
+        avatar.append(el('div', 'width: 100%; height: 100%; display: flex; align-items: center; justify-content: center; font-size: 1.2rem; font-weight: 700; color: white;',
+            post.author.username[0].toUpperCase()));
+    }
+    const name = el('div', 'font-weight: 600; display: flex; align-items: center; gap: 6px;', post.author.username);
+    const badge = ROLE_BADGES[post.author.role];
+    if (badge) name.append(el('span', `${badge[1]} padding: 2px 8px; border-radius: 10px; font-size: 0.7rem;`, badge[0]));
+    const meta = el('div', 'font-size: 0.8rem; color: var(--text-muted);', post.created_at.slice(0, 16).replace('T', ' '));
+    if (post.visibility === 'paid') meta.append(el('span', 'margin-left: 8px;', '🔒 限定公開'));
+    card.append(el('div', 'display: flex; justify-content: space-between; margin-bottom: 12px;',
+        el('div', 'display: flex; align-items: center; gap: 10px;', avatar, el('div', '', name)), meta));
+
+    card.append(el('div', 'margin-bottom: 16px; white-space: pre-wrap;', post.content));
+    if (post.image_url) {
+        const img = el('img', 'width: 100%; display: block;');
+        img.src = post.image_url;
+        if (post.image_srcset) {
+            // Same sizes as templates/fragments/post_header.html
+            img.srcset = post.image_srcset;
+            img.sizes = '(max-width: 700px) 100vw, 700px';
+        }
+        img.alt = 'Post Image';
+        card.append(el('div', 'margin-bottom: 16px; border-radius: var(--radius-m); overflow: hidden;', img));
+    }
+
+    // Actions
+    const toggle = (type, active, style) => {
+        const btn = el('button', `background: none; border: none; cursor: pointer; display: flex; align-items: center; ${style}`);
+        btn.className = 'ajax-toggle-btn';
+        Object.assign(btn.dataset, { type: type, postId: post.id, url: post.urls[type], active: String(active) });
+        btn.innerHTML = icon(type, active);
+        return btn;
+    };
+    const countStyle = 'font-size: 1rem; font-weight: 500;';
+    const like = toggle('like', post.liked, `gap: 6px; transition: transform 0.1s; color: ${post.liked ? '#e74c3c' : 'var(--text-color)'};`);
+    const likeCount = el('span', countStyle, String(post.like_count));
+    likeCount.className = 'count-span';
+    like.append(likeCount);
+
+    const commentsBtn = el('button', 'background: none; border: none; cursor: pointer; display: flex; align-items: center; gap: 6px; color: var(--text-color); transition: opacity 0.2s;');
+    commentsBtn.innerHTML = icon('comment');
+    const commentCount = el('span', countStyle, String(post.comment_count));
+    commentCount.className = 'comment-count';
+    commentsBtn.append(commentCount);
+    commentsBtn.addEventListener('click', () => toggleComments(post.id));
+
+    const right = el('div', 'display: flex; gap: 20px; align-items: center;',
+        toggle('save', post.saved, `color: ${post.saved ? 'var(--accent)' : 'var(--text-muted)'};`));
+    if (post.can_delete) {
+        const form = el('form', 'margin: 0;');
+        form.method = 'POST';
+        form.action = post.urls.delete;
+        const btn = el('button', 'background: none; border: none; cursor: pointer; color: var(--text-muted); opacity: 0.7;');
+        btn.type = 'submit';
+        btn.innerHTML = icon('delete', false, 20);
+        btn.addEventListener('click', (e) => { if (!confirm('本当に削除しますか？')) e.preventDefault(); });
+        form.append(btn);
+        right.append(form);
+    }
+
+    // Comments (hidden until toggled)
+    const list = el('div');
+    list.className = 'comment-list';
+    if (post.comments_cursor) {
+        const older = el('button', 'background: none; border: none; color: var(--text-muted); font-size: 0.85rem; padding: 0 0 10px; cursor: pointer;', '以前のコメントを表示');
+        older.type = 'button';
+        older.className = 'load-comments-btn';
+        Object.assign(older.dataset, { url: post.urls.comments, cursor: post.comments_cursor });
+        list.append(older);
+    }
+    list.append(...post.comments.map(renderComment));
+
+    const input = el('input', 'margin-bottom: 0;');
+    Object.assign(input, { type: 'text', name: 'content', placeholder: 'コメントを書く...', required: true });
+    const send = el('button', 'padding: 0 15px;', '送信');
+    send.type = 'submit';
+    send.className = 'btn btn-primary';
+    const form = el('form', 'margin-top: 10px; display: flex; gap: 10px;', input, send);
+    form.method = 'POST';
+    form.action = post.urls.comment;
+    form.className = 'comment-form';
+
+    const comments = el('div', 'display: none; background: rgba(0,0,0,0.2); padding: 15px; border-radius: var(--radius-m);', list, form);
+    comments.id = `comments-${post.id}`;
+
+    card.append(el('div', 'border-top: 1px solid var(--border-color); padding-top: 12px; display: flex; flex-direction: column; gap: 15px;',
+        el('div', 'display: flex; align-items: center; justify-content: space-between;',
+            el('div', 'display: flex; gap: 20px; align-items: center;', like, commentsBtn), right),
+        comments));
+    return card;
+}
+
+// POST a form over fetch; resolves to the JSON body or throws with the server's message
+async function submitJson(form) {
+    const response = await fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: { 'X-Requested-With': 'XMLHttpRequest' }
+    });
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok || data.status !== 'success') throw new Error(data.message || '');
+    return data;
+}
+
 function showToast(message, type = 'success') {
     let container = document.querySelector('.toast-container');
     if (!container) {
@@ -20,7 +175,230 @@ function showToast(message, type = 'success') {
     }, 3000);
 }
 
+// Upload a file straight to storage using a signed target from /uploads/sign.
+// Returns the upload token to submit with the form instead of the file.
+async function directUpload(file, kind, nonce) {
+    const signResponse = await fetch('/uploads/sign', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-Requested-With': 'XMLHttpRequest'
+        },
+        body: JSON.stringify({ kind: kind, content_type: file.type, nonce: nonce })
+    });
+    if (!signResponse.ok) throw new Error('Could not sign upload');
+    const target = await signResponse.json();
+
+    let uploadResponse;
+    if (target.method === 'PUT') {
+        uploadResponse = await fetch(target.url, {
+            method: 'PUT',
+            headers: { 'Content-Type': file.type },
+            body: file
+        });
+    } else {
+        // Presigned POST: policy fields first, file last
+        const formData = new FormData();
+        Object.entries(target.fields).forEach(([name, value]) => formData.append(name, value));
+        formData.append('file', file);
+        uploadResponse = await fetch(target.url, { method: 'POST', body: formData });
+    }
+    if (!uploadResponse.ok) throw new Error('Upload failed');
+
+    return target.upload_token;
+}
+
 document.addEventListener('DOMContentLoaded', () => {
+    // Direct-to-storage uploads for file inputs marked with data-direct-upload.
+    // On any failure the file stays selected and is sent with the form as before.
+    document.querySelectorAll('input[type="file"][data-direct-upload]').forEach((input) => {
+        input.addEventListener('change', async () => {
+            const file = input.files[0];
+            const form = input.form;
+            const tokenField = form.querySelector(`input[name="${input.dataset.tokenField}"]`);
+            const submitBtn = form.querySelector('button[type="submit"]');
+            tokenField.value = '';
+            if (!file) return;
+
+            if (submitBtn) submitBtn.disabled = true;
+            try {
+                tokenField.value = await directUpload(file, input.dataset.directUpload, input.dataset.uploadNonce);
+                input.value = ''; // Don't send the bytes through the app again
+                showToast('画像をアップロードしました');
+            } catch (err) {
+                console.error(err);
+            } finally {
+                if (submitBtn) submitBtn.disabled = false;
+            }
+        });
+    });
+
+    // Typeahead: fill the input's datalist from a JSON search endpoint
+    document.querySelectorAll('input[data-typeahead-url]').forEach((input) => {
+        const list = document.getElementById(input.getAttribute('list'));
+        let timer;
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            const q = input.value.trim();
+            if (!q) return;
+            timer = setTimeout(async () => {
+                const response = await fetch(`${input.dataset.typeaheadUrl}?q=${encodeURIComponent(q)}`);
+                if (!response.ok) return;
+                const users = await response.json();
+                list.replaceChildren(...users.map((user) => {
+                    const option = document.createElement('option');
+                    option.value = user.username;
+                    return option;
+                }));
+            }, 150);
+        });
+    });
+
+    // Infinite scroll: load the next feed page as the end of the stream comes into view
+    const more = document.querySelector('.feed-more');
+    if (more && 'IntersectionObserver' in window) {
+        const stream = document.querySelector('.feed-stream');
+        const observer = new IntersectionObserver(async (entries) => {
+            if (!entries[0].isIntersecting) return;
+            observer.unobserve(more);
+            try {
+                const response = await fetch(`${more.dataset.url}?cursor=${encodeURIComponent(more.dataset.cursor)}`);
+                if (!response.ok) throw new Error('Network response was not ok');
+                const data = await response.json();
+                data.posts.forEach((post) => {
+                    // Skip cards already shown, e.g. one just created on this page
+                    if (!document.getElementById(`post-${post.id}`)) stream.append(renderPost(post));
+                });
+                if (data.next_cursor) {
+                    more.dataset.cursor = data.next_cursor;
+                    more.querySelector('a').search = `?cursor=${encodeURIComponent(data.next_cursor)}`;
+                    observer.observe(more); // Fires again right away if still in view
+                } else {
+                    more.remove();
+                }
+            } catch (err) {
+                // Leave the "もっと見る" link as the way forward
+                console.error(err);
+            }
+        }, { rootMargin: '600px' });
+        observer.observe(more);
+    }
+
+    // Live updates: other viewers' likes/comments and a notice for new posts
+    const live = document.querySelector('.feed-stream[data-events-url]');
+    if (live && 'EventSource' in window) {
+        const notice = document.querySelector('.new-posts-notice');
+        let fresh = 0;
+        let retryDelay = 5000;
+
+        const onCounts = (e) => {
+            Object.entries(JSON.parse(e.data)).forEach(([postId, delta]) => {
+                const card = document.getElementById(`post-${postId}`);
+                if (!card) return;
+                const likes = card.querySelector('.ajax-toggle-btn[data-type="like"] .count-span');
+                const comments = card.querySelector('.comment-count');
+                if (likes) likes.textContent = parseInt(likes.textContent) + delta.likes;
+                if (comments) comments.textContent = parseInt(comments.textContent) + delta.comments;
+            });
+        };
+
+        const onPost = (e) => {
+            if (document.getElementById(`post-${JSON.parse(e.data).id}`)) return;
+            fresh += 1;
+            notice.textContent = `新しい投稿が${fresh}件あります`;
+            notice.style.display = 'block';
+        };
+
+        const connect = () => {
+            const source = new EventSource(live.dataset.eventsUrl);
+            source.addEventListener('open', () => { retryDelay = 5000; });
+            source.addEventListener('counts', onCounts);
+            source.addEventListener('post', onPost);
+            source.addEventListener('error', () => {
+                // The browser reconnects dropped streams itself but gives up
+                // on a refused one (503 when the server is full): retry later
+                if (source.readyState !== EventSource.CLOSED) return;
+                setTimeout(connect, retryDelay * (0.5 + Math.random()));
+                retryDelay = Math.min(retryDelay * 2, 5 * 60 * 1000);
+            });
+        };
+        connect();
+
+        notice.addEventListener('click', async () => {
+            try {
+                const response = await fetch(notice.dataset.url);
+                if (!response.ok) throw new Error('Network response was not ok');
+                const data = await response.json();
+                document.querySelector('.feed-empty')?.remove();
+                // Newest first in the payload; prepend oldest first to keep that order
+                data.posts.slice().reverse().forEach((post) => {
+                    if (!document.getElementById(`post-${post.id}`)) live.prepend(renderPost(post));
+                });
+                fresh = 0;
+                notice.style.display = 'none';
+            } catch (err) {
+                console.error(err);
+                showToast('エラーが発生しました。接続を確認してください。', 'error');
+            }
+        });
+    }
+
+    // New posts and comments are inserted in place instead of reloading the feed
+    document.body.addEventListener('submit', async (e) => {
+        const form = e.target;
+        const isPost = form.matches('.post-form');
+        if (!isPost && !form.matches('.comment-form')) return;
+
+        e.preventDefault();
+        const submitBtn = form.querySelector('button[type="submit"]');
+        submitBtn.disabled = true;
+        try {
+            const data = await submitJson(form);
+            if (isPost) {
+                document.querySelector('.feed-empty')?.remove();
+                document.querySelector('.feed-stream').prepend(renderPost(data.post));
+                showToast('Post created!');
+            } else {
+                form.parentElement.querySelector('.comment-list').append(renderComment(data.comment));
+                form.closest('[id^="post-"]').querySelector('.comment-count').textContent = data.comment_count;
+            }
+            form.reset();
+            // reset() keeps hidden values such as a used upload token
+            form.querySelectorAll('input[type="hidden"]').forEach((input) => { input.value = ''; });
+        } catch (err) {
+            console.error(err);
+            showToast(err.message || 'エラーが発生しました。接続を確認してください。', 'error');
+        } finally {
+            submitBtn.disabled = false;
+        }
+    });
+
+    // Load older comments of a card, a page at a time
+    document.body.addEventListener('click', async (e) => {
+        const btn = e.target.closest('.load-comments-btn');
+        if (!btn || btn.disabled) return;
+
+        btn.disabled = true;
+        try {
+            const response = await fetch(`${btn.dataset.url}?cursor=${encodeURIComponent(btn.dataset.cursor)}`);
+            if (!response.ok) throw new Error('Network response was not ok');
+            const data = await response.json();
+
+            // Pages come newest first; each one goes just above the comments already shown
+            data.comments.forEach((comment) => btn.after(renderComment(comment)));
+            if (data.next_cursor) {
+                btn.dataset.cursor = data.next_cursor;
+                btn.disabled = false;
+            } else {
+                btn.remove();
+            }
+        } catch (err) {
+            console.error(err);
+            btn.disabled = false;
+            showToast('コメントを読み込めませんでした。', 'error');
+        }
+    });
+
     // Handle Like/Save AJAX
     document.body.addEventListener('click', async (e) => {
         const btn = e.target.closest('.ajax-toggle-btn');
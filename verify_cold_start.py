@@ -0,0 +1,116 @@
+"""
+Cold-start timing check.
+
+Measures, in fresh interpreters, how long create_app() takes and how many
+SQL statements it issues. It does this in the dev mode (AUTO_CREATE_TABLES=1)
+and in the production mode that gunicorn.conf.py selects. It then migrates a
+scratch database and boots the real gunicorn config, timing until the first
+request is answered.
+
+    python verify_cold_start.py
+    COLD_START_BUDGET=1.5 python verify_cold_start.py
+
+Fails if the production mode touches the database while booting, or if
+app construction or the gunicorn boot exceeds COLD_START_BUDGET seconds.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BUDGET = float(os.environ.get('COLD_START_BUDGET', 3.0))  # Seconds
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MEASURE = """
+import json, time
+start = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'statements': len(statements)}))
+"""
+
+
+def run_python(code, env):
+    output = subprocess.run([sys.executable, '-c', code], env=env, cwd=HERE,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def gunicorn_boot(env):
+    """Seconds from launching gunicorn to the first answered request."""
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app:create_app', 'db', 'upgrade'],
+                   env=dict(env, AUTO_CREATE_TABLES='0'), cwd=HERE, check=True, capture_output=True)
+    port = free_port()
+    env = dict(env, PORT=str(port), WEB_CONCURRENCY='2')
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+                              env=env, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while time.perf_counter() - start < BUDGET * 5:
+            if server.poll() is not None:
+                raise RuntimeError('gunicorn exited:\n' + server.stderr.read().decode())
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError('gunicorn did not answer in time')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    scratch = tempfile.mkdtemp()
+    base_env = dict(os.environ, PASSWORD_HASH_WORKERS='0')
+    ok = True
+    print(f"--- cold start (budget {BUDGET:.1f}s) ---")
+
+    for mode, flag in (('dev', '1'), ('production', '0')):
+        env = dict(base_env, AUTO_CREATE_TABLES=flag,
+                   DATABASE_URL='sqlite:///' + os.path.join(scratch, f'{mode}.db'))
+        result = run_python(MEASURE, env)
+        print(f"{mode:<11} import {result['import']:.2f}s  create_app {result['create_app']:.2f}s  "
+              f"{result['statements']} SQL statements at boot")
+        if result['create_app'] > BUDGET:
+            print(f"[FAIL] {mode} create_app exceeded the budget")
+            ok = False
+        if mode == 'production' and result['statements']:
+            print("[FAIL] production startup touched the database")
+            ok = False
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("gunicorn not installed, skipping the server boot check")
+    else:
+        env = dict(base_env, DATABASE_URL='sqlite:///' + os.path.join(scratch, 'gunicorn.db'))
+        boot = gunicorn_boot(env)
+        print(f"gunicorn    first response after {boot:.2f}s")
+        if boot > BUDGET:
+            print("[FAIL] gunicorn boot exceeded the budget")
+            ok = False
+
+    return ok
+
+
+if __name__ == '__main__':
+    assert main(), "cold start check failed"
+    print("--- cold start OK ---")
@@ -0,0 +1,108 @@
+"""
+Read-replica routing check with two local SQLite files.
+
+The replica starts as a copy of the primary and is then never updated, so
+it lags behind by construction; one post is edited on the replica alone
+so its pages can be told apart. Checks that read-only views read from the
+replica, that writes land on the primary only, and that a user's own
+post/like is readable right away (sticky primary) until
+REPLICA_STICKY_SECONDS have passed.
+
+    python verify_read_replica.py
+"""
+import os
+import shutil
+import tempfile
+import time
+
+scratch = tempfile.mkdtemp()
+PRIMARY = os.path.join(scratch, 'primary.db')
+REPLICA = os.path.join(scratch, 'replica.db')
+os.environ.update(DATABASE_URL='sqlite:///' + PRIMARY, DATABASE_REPLICA_URLS='sqlite:///' + REPLICA,
+                  REPLICA_STICKY_SECONDS='1', PASSWORD_HASH_WORKERS='0')
+
+from app import create_app
+from extensions import db
+from models import User, Post
+
+app = create_app()
+app.config['TESTING'] = True
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def count_posts(path, content):
+    import sqlite3
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT count(*) FROM post WHERE content = ?', (content,)).fetchone()[0]
+
+
+with app.app_context():
+    print("--- starting read replica verification ---")
+    owner = User(username='owner', email='owner@test.com', role='owner', sms_credits=10)
+    reader = User(username='reader', email='reader@test.com', role='free')
+    db.session.add_all([owner, reader])
+    db.session.flush()
+    db.session.add(Post(content='Original post', author=owner, visibility='all'))
+    db.session.commit()
+    owner_id, reader_id = owner.id, reader.id
+
+    # Snapshot the primary into the replica, then make the replica recognizable
+    db.session.execute(db.text('PRAGMA wal_checkpoint(TRUNCATE)'))
+    db.session.commit()
+    for engine in db.engines.values():
+        engine.dispose()
+    shutil.copy(PRIMARY, REPLICA)
+    with db.engines['replica0'].begin() as conn:
+        # New updated_at too, so cached card fragments tell the two versions apart
+        conn.execute(db.text("UPDATE post SET content = 'Replica copy', updated_at = datetime('now', '+1 minute') "
+                             "WHERE content = 'Original post'"))
+
+author, other = app.test_client(), app.test_client()
+login(author, owner_id)
+login(other, reader_id)
+
+# 1. Read-only views read from the replica
+page = author.get('/feed').get_data(as_text=True)
+assert 'Replica copy' in page and 'Original post' not in page
+assert 'reader' in other.get('/members').get_data(as_text=True)
+print("[PASS] Feed and members read from the replica")
+
+# 2. Writes go to the primary only
+author.post('/post/new', data={'content': 'Fresh post', 'visibility': 'all'})
+assert count_posts(PRIMARY, 'Fresh post') == 1 and count_posts(REPLICA, 'Fresh post') == 0
+print("[PASS] create_post wrote to the primary only")
+
+# 3. The author reads their own write; everyone else still sees the replica
+page = author.get('/feed').get_data(as_text=True)
+assert 'Fresh post' in page and 'Original post' in page
+page = other.get('/feed').get_data(as_text=True)
+assert 'Fresh post' not in page and 'Replica copy' in page
+print("[PASS] Author is sticky to the primary, other users are not")
+
+# 4. Stickiness expires
+time.sleep(1.2)
+page = author.get('/feed').get_data(as_text=True)
+assert 'Replica copy' in page and 'Fresh post' not in page
+print("[PASS] Author returns to the replica after REPLICA_STICKY_SECONDS")
+
+# 5. toggle_like also makes the author sticky
+with app.app_context():
+    post_id = db.session.query(Post.id).filter_by(content='Fresh post').scalar()
+author.post(f'/post/{post_id}/like')
+assert 'Fresh post' in author.get('/feed').get_data(as_text=True)
+print("[PASS] toggle_like makes the author sticky")
+
+# 6. Other read-only views lag with the replica too
+with app.app_context():
+    db.session.add(User(username='latecomer', email='late@test.com'))
+    db.session.commit()
+assert 'latecomer' not in other.get('/members').get_data(as_text=True)
+assert 'latecomer' not in other.get('/members/search?q=late').get_data(as_text=True)
+print("[PASS] Members added on the primary are not visible until replicated")
+
+print("--- verification complete ---")